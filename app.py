@@ -5,40 +5,113 @@ Main application file with routes and view logic.
 
 import os
 import json
+import hashlib
+import threading
 import glob
 import zlib
 import base64
 import string
-from datetime import datetime
+from datetime import datetime, timezone
 from pathlib import Path
-from flask import Flask, render_template, request, redirect, url_for, jsonify, flash, send_from_directory, Response
+from flask import Flask, render_template, request, redirect, url_for, jsonify, flash, send_from_directory, Response, stream_with_context, make_response, session
 from dotenv import load_dotenv
 import requests as http_requests
+from werkzeug.http import is_resource_modified
 
-from models import WeatherRequest, ForecastResult, init_db
-from forecast import ForecastEngine, WeatherDataFetcher, detect_query_type
-
-# Load environment variables
+# Load environment variables before the modules that read their settings
 load_dotenv()
 
+from cache import TTLCache
+from models import WeatherRequest, ForecastResult, ForecastJob, init_db, transaction
+from forecast import ForecastEngine, WeatherDataFetcher, detect_query_type, CURRENT_CACHE_TTL, FORECAST_CACHE_TTL
+from jobs import JobQueue, TERMINAL_EVENTS
+
 # Initialize Flask app
 app = Flask(__name__)
 app.secret_key = os.getenv('SECRET_KEY', 'galaxy_weather_secret')
 
-# Initialize database
-init_db()
-
-# Initialize forecast engine
-forecast_engine = ForecastEngine()
+# Seconds browsers and CDNs may reuse a stored forecast page (results never change)
+RESULT_CACHE_MAX_AGE = int(os.getenv('RESULT_CACHE_MAX_AGE', 31536000))
+# API responses are as fresh as the shortest-lived upstream data they contain
+API_CACHE_MAX_AGE = min(CURRENT_CACHE_TTL, FORECAST_CACHE_TTL)
+# Rendered pages kept per process; listing keys include the newest result id,
+# so saving a result invalidates them in every process
+PAGE_CACHE_SIZE = int(os.getenv('PAGE_CACHE_SIZE', 256))
+PAGE_CACHE_TTL = int(os.getenv('PAGE_CACHE_TTL', 3600))
+# Most locations accepted by one /api/forecast/batch call
+BATCH_MAX_QUERIES = int(os.getenv('BATCH_MAX_QUERIES', 500))
+# Accepted upload file types: JSON arrays/objects and newline-delimited JSON
+UPLOAD_EXTENSIONS = ('.json', '.ndjson', '.jsonl')
+
+page_cache = TTLCache(PAGE_CACHE_SIZE, PAGE_CACHE_TTL, name='pages')
+
+# Created once per process by bootstrap()
+forecast_engine = None
+job_queue = None
+_bootstrapped = False
+_bootstrap_lock = threading.Lock()
+
+
+def bootstrap():
+    """
+    Run the one-time startup work: schema check, forecast engine, job queue.
+    
+    Idempotent and cheap after the first call. Nothing here runs at import
+    time, so importing the app or its modules never touches the database.
+    The job workers start here, and again in a forked child on its first
+    request, so jobs queued before a restart are picked up without waiting
+    for a new submission.
+    """
+    global forecast_engine, job_queue, _bootstrapped
+    if not _bootstrapped:
+        with _bootstrap_lock:
+            if not _bootstrapped:
+                init_db()
+                forecast_engine = ForecastEngine()
+                job_queue = JobQueue(run_forecast)
+                _bootstrapped = True
+    job_queue.start()
+
+
+def render_cached(key, render):
+    """
+    Return the rendered page for key from the page cache, rendering and
+    storing it on a miss.
+    
+    Bypassed while flash messages are pending, since base.html renders
+    them into the page for this one response.
+    
+    Args:
+        key: Cache key identifying the page content
+        render: Callable returning the page HTML
+    """
+    if session.get('_flashes'):
+        return render()
+    html = page_cache.get(key)
+    if html is None:
+        html = render()
+        page_cache.set(key, html)
+    return html
+
+
+def create_app():
+    """Application factory: bootstrap once and return the Flask app."""
+    bootstrap()
+    return app
+
+
+@app.before_request
+def ensure_bootstrapped():
+    """Bootstrap lazily when the app is served without create_app()."""
+    bootstrap()
 
 
 @app.route('/')
 def index():
     """Main landing page with hero, about, contact, and forecast form."""
     # Get recent forecasts for history section
-    recent_forecasts = ForecastResult.get_all_with_requests(limit=10)
-    
-    return render_template('index.html', forecasts=recent_forecasts)
+    return render_cached(('index', ForecastResult.latest_id()), lambda: render_template(
+        'index.html', forecasts=ForecastResult.get_all_with_requests(limit=10)))
 
 
 @app.route('/forecast', methods=['POST'])
@@ -54,16 +127,29 @@ def create_forecast():
             flash('Please enter a location or upload a JSON file.', 'error')
             return redirect(url_for('index'))
         
+        # Analyze an uploaded file while it streams in, so only the small
+        # aggregate is queued instead of the readings themselves
+        upload_result = None
+        if json_file:
+            upload_result = forecast_engine.process_json_stream(json_file.stream)
+            if 'error' in upload_result:
+                flash(upload_result['error'], 'error')
+                return redirect(url_for('index'))
+        
         # Detect query type
         query_type = detect_query_type(query) if query else 'json_upload'
         
-        # Create weather request
-        weather_request = WeatherRequest(
-            query=query or 'JSON Upload',
-            query_type=query_type,
-            range_days=range_days,
-            status='processing'
-        ).save()
+        # Create the request and its job together, so a request never
+        # exists without a job for the workers to pick up
+        with transaction():
+            weather_request = WeatherRequest(
+                query=query or 'JSON Upload',
+                query_type=query_type,
+                range_days=range_days,
+                status='processing'
+            ).save()
+            job_queue.enqueue(weather_request.id,
+                              {'upload_result': upload_result} if upload_result else None)
         
         # Redirect to loading page
         return redirect(url_for('loading', request_id=weather_request.id, 
@@ -81,120 +167,381 @@ def loading(request_id):
     return render_template('loading.html', request_id=request_id, has_json=has_json)
 
 
-@app.route('/process/<int:request_id>', methods=['POST'])
-def process_forecast(request_id):
-    """Process the forecast request (called via AJAX from loading page)."""
+def run_forecast(request_id, payload=None, progress=None):
+    """
+    Process a queued forecast request (runs on a background worker).
+    
+    Args:
+        request_id: WeatherRequest id
+        payload: Optional job payload; {'upload_result': ...} holds an
+                 uploaded file already analyzed when it was received
+        progress: Optional callable(event, data) receiving pipeline events
+    
+    Returns:
+        str: Error message on failure, or None on success
+    """
+    weather_request = WeatherRequest.get_by_id(request_id)
+    if not weather_request:
+        return 'Request not found'
+    
     try:
-        weather_request = WeatherRequest.get_by_id(request_id)
-        if not weather_request:
-            return jsonify({'error': 'Request not found'}), 404
-        
-        # Check for JSON data in request
-        json_data = None
-        if request.is_json and request.json.get('json_data'):
-            json_data = request.json.get('json_data')
-        
         # Process forecast
-        if json_data:
-            # Process uploaded JSON
-            forecast_data = forecast_engine.process_json_upload(json_data)
+        if payload and 'upload_result' in payload:
+            # Uploaded file, analyzed when it was received
+            forecast_data = payload['upload_result']
+            if progress:
+                progress('analysis', {})
         else:
             # Fetch from API
             forecast_data = forecast_engine.generate_forecast(
                 weather_request.query, 
-                weather_request.range_days
+                weather_request.range_days,
+                progress=progress
             )
         
         if 'error' in forecast_data:
             weather_request.update_status('failed')
-            return jsonify({'error': forecast_data['error']}), 400
+            return forecast_data['error']
         
         # Save forecast result
         location = forecast_data.get('location', {})
         current = forecast_data.get('current', {})
         
-        forecast_result = ForecastResult(
-            request_id=request_id,
-            location_name=location.get('name', 'Unknown'),
-            country=location.get('country', ''),
-            latitude=location.get('lat'),
-            longitude=location.get('lon'),
-            forecast_data=forecast_data,
-            current_temp=current.get('temp_c'),
-            current_humidity=current.get('humidity'),
-            current_condition=current.get('condition')
-        ).save()
-        
-        # Update request status
-        weather_request.update_status('completed')
+        # Save the result and complete the request in one transaction
+        with transaction():
+            forecast_result = ForecastResult(
+                request_id=request_id,
+                location_name=location.get('name', 'Unknown'),
+                country=location.get('country', ''),
+                latitude=location.get('lat'),
+                longitude=location.get('lon'),
+                forecast_data=forecast_data,
+                current_temp=current.get('temp_c'),
+                current_humidity=current.get('humidity'),
+                current_condition=current.get('condition')
+            ).save()
+            weather_request.update_status('completed')
+        if progress:
+            progress('saved', {'result_id': forecast_result.id})
+        return None
+    
+    except Exception as e:
+        weather_request.update_status('failed')
+        return str(e)
+
+
+@app.route('/process/<int:request_id>', methods=['POST'])
+def process_forecast(request_id):
+    """
+    Report where a forecast request stands (called via AJAX from loading page).
+    
+    Requests are queued when they are created, so this never queues work;
+    calling it any number of times, or not at all, changes nothing.
+    """
+    try:
+        status = get_request_status(request_id)
+        if status is None:
+            return jsonify({'error': 'Request not found'}), 404
+        if status['status'] in ('completed', 'failed'):
+            return jsonify(status)
         
         return jsonify({
-            'success': True,
-            'redirect': url_for('forecast_result', request_id=request_id)
-        })
+            'queued': True,
+            'status_url': url_for('forecast_status', request_id=request_id)
+        }), 202
     
     except Exception as e:
         return jsonify({'error': str(e)}), 500
 
 
-@app.route('/forecast/<int:request_id>')
-def forecast_result(request_id):
-    """Display forecast results page."""
+def get_request_status(request_id):
+    """Build the status payload of a forecast request, or None if unknown."""
     weather_request = WeatherRequest.get_by_id(request_id)
     if not weather_request:
-        flash('Forecast not found.', 'error')
-        return redirect(url_for('index'))
+        return None
+    
+    if weather_request.status == 'completed':
+        return {
+            'status': 'completed',
+            'success': True,
+            'redirect': url_for('forecast_result', request_id=request_id)
+        }
     
-    result = ForecastResult.get_by_request_id(request_id)
+    job = ForecastJob.get_by_request_id(request_id)
+    if weather_request.status == 'failed' or (job and job.status == 'failed'):
+        return {
+            'status': 'failed',
+            'error': (job.error if job else None) or 'Forecast processing failed'
+        }
+    
+    return {
+        'status': job.status if job else weather_request.status
+    }
+
+
+@app.route('/status/<int:request_id>')
+def forecast_status(request_id):
+    """Cheap status check polled by the loading page."""
+    status = get_request_status(request_id)
+    if status is None:
+        return jsonify({'error': 'Request not found'}), 404
+    return jsonify(status)
+
+
+def sse_event(event, data, event_id=None):
+    """Format one Server-Sent Events message."""
+    message = f'event: {event}\ndata: {json.dumps(data)}\n\n'
+    if event_id is not None:
+        message = f'id: {event_id}\n' + message
+    return message
+
+
+@app.route('/stream/<int:request_id>')
+def forecast_stream(request_id):
+    """
+    Stream real progress events of a queued forecast as Server-Sent Events.
+    
+    Events are replayed from the shared progress log, so the stream can be
+    (re)opened at any time and in any process; disconnecting never cancels
+    the job.
+    """
+    status = get_request_status(request_id)
+    if status is None:
+        return jsonify({'error': 'Request not found'}), 404
+    
+    redirect_url = url_for('forecast_result', request_id=request_id)
+    last_event_id = request.headers.get('Last-Event-ID', '0')
+    after = int(last_event_id) if last_event_id.isdigit() else 0
+    
+    def generate():
+        seen = after
+        # Job may have finished before the stream opened, or in another process
+        current = status
+        while True:
+            finished = current['status'] in ('completed', 'failed')
+            events = job_queue.progress.wait(request_id, after=seen,
+                                             timeout=0 if finished else 10)
+            for seq, event, data in events:
+                seen = seq
+                if event == 'done':
+                    data = dict(data, redirect=redirect_url)
+                yield sse_event(event, data, seq)
+                if event in TERMINAL_EVENTS:
+                    return
+            
+            if not events:
+                if current['status'] == 'completed':
+                    yield sse_event('done', {'redirect': redirect_url})
+                    return
+                if current['status'] == 'failed':
+                    yield sse_event('error', {'error': current['error']})
+                    return
+                yield ': keep-alive\n\n'
+                current = get_request_status(request_id)
+    
+    return Response(stream_with_context(generate()), mimetype='text/event-stream', headers={
+        'Cache-Control': 'no-cache',
+        'X-Accel-Buffering': 'no'
+    })
+
+
+def result_validators(result):
+    """
+    Build the validators of a stored result: a strong ETag from its id and
+    creation time, and its creation time as Last-Modified.
+    
+    Returns:
+        tuple: (etag, last_modified datetime or None)
+    """
+    etag = hashlib.sha1(f'{result.id}:{result.created_at}'.encode('utf-8')).hexdigest()[:20]
+    try:
+        # SQLite CURRENT_TIMESTAMP is UTC
+        last_modified = datetime.strptime(str(result.created_at), '%Y-%m-%d %H:%M:%S')
+        last_modified = last_modified.replace(tzinfo=timezone.utc)
+    except ValueError:
+        last_modified = None
+    return etag, last_modified
+
+
+def set_result_cache_headers(response, etag, last_modified):
+    """Mark a stored result response as immutable and cacheable."""
+    response.set_etag(etag)
+    if last_modified:
+        response.last_modified = last_modified
+    response.cache_control.public = True
+    response.cache_control.max_age = RESULT_CACHE_MAX_AGE
+    response.cache_control.immutable = True
+    return response
+
+
+def set_api_cache_headers(response, forecast_data):
+    """
+    Make a generated forecast cacheable for API_CACHE_MAX_AGE seconds from
+    its generated_at, which for a reused nearby result can be well in the
+    past, and send that time as Last-Modified.
+    """
+    response.cache_control.public = True
+    response.cache_control.max_age = API_CACHE_MAX_AGE
+    try:
+        generated_at = datetime.fromisoformat(forecast_data['generated_at'])
+        age = (datetime.now(timezone.utc) - generated_at).total_seconds()
+    except (KeyError, TypeError, ValueError):
+        return response
+    response.cache_control.max_age = max(0, int(API_CACHE_MAX_AGE - age))
+    response.last_modified = generated_at
+    return response
+
+
+@app.route('/forecast/<int:request_id>')
+def forecast_result(request_id):
+    """
+    Display forecast results page.
+    
+    Saved results never change, so the page carries validators and
+    conditional requests are answered with 304 before the forecast data is
+    read or the template rendered. Rendered pages are kept in the page
+    cache by result id.
+    """
+    result = ForecastResult.get_by_request_id(request_id, defer_data=True)
     if not result:
-        flash('Forecast result not available.', 'error')
+        if not WeatherRequest.get_by_id(request_id):
+            flash('Forecast not found.', 'error')
+        else:
+            flash('Forecast result not available.', 'error')
         return redirect(url_for('index'))
     
-    forecast_data = result.get_forecast_data()
+    etag, last_modified = result_validators(result)
+    if not is_resource_modified(request.environ, etag=etag, last_modified=last_modified):
+        return set_result_cache_headers(Response(status=304), etag, last_modified)
+    
+    # Pending flash messages are rendered into this one response only
+    cacheable = not session.get('_flashes')
+    
+    def render():
+        return render_template('forecast.html', 
+                               request=WeatherRequest.get_by_id(request_id), 
+                               result=result,
+                               forecast=result.get_forecast_data())
     
-    return render_template('forecast.html', 
-                          request=weather_request, 
-                          result=result,
-                          forecast=forecast_data)
+    response = make_response(render_cached(('forecast', result.id), render))
+    if cacheable:
+        set_result_cache_headers(response, etag, last_modified)
+    else:
+        response.cache_control.no_store = True
+    return response
 
 
 @app.route('/history')
 def history():
-    """View all forecast history."""
-    forecasts = ForecastResult.get_all_with_requests(limit=50)
-    return render_template('history.html', forecasts=forecasts)
+    """View forecast history, paged newest first with an opaque cursor."""
+    cursor = request.args.get('cursor')
+    
+    def render():
+        forecasts, next_cursor = ForecastResult.get_page(limit=50, cursor=cursor)
+        return render_template('history.html', forecasts=forecasts,
+                              cursor=cursor, next_cursor=next_cursor)
+    
+    return render_cached(('history', cursor, ForecastResult.latest_id()), render)
 
 
-@app.route('/api/forecast', methods=['POST'])
+@app.route('/api/forecast', methods=['GET', 'POST'])
 def api_forecast():
-    """API endpoint for programmatic forecast requests."""
+    """
+    API endpoint for programmatic forecast requests.
+    
+    Location forecasts are cacheable for API_CACHE_MAX_AGE seconds from when
+    they were generated, matching the upstream response cache, and carry that
+    time as Last-Modified. GET (?location=&days=) responses also carry an
+    ETag and answer conditional requests with 304.
+    """
     try:
-        data = request.get_json()
+        data = request.args.to_dict() if request.method == 'GET' else request.get_json()
         
         if not data:
             return jsonify({'error': 'No data provided'}), 400
         
         query = data.get('location') or data.get('query')
-        days = data.get('days', 7)
+        days = int(data.get('days', 7))
         json_data = data.get('weather_data')
         
         if not query and not json_data:
             return jsonify({'error': 'Location or weather_data required'}), 400
         
         if json_data:
-            forecast_data = forecast_engine.process_json_upload(json_data)
-        else:
-            forecast_data = forecast_engine.generate_forecast(query, days)
+            return jsonify(forecast_engine.process_json_upload(json_data))
         
-        return jsonify(forecast_data)
+        forecast_data = forecast_engine.generate_forecast(query, days)
+        response = jsonify(forecast_data)
+        if 'error' in forecast_data:
+            response.cache_control.no_store = True
+            return response
+        
+        set_api_cache_headers(response, forecast_data)
+        response.add_etag()
+        return response.make_conditional(request)
     
     except Exception as e:
         return jsonify({'error': str(e)}), 500
 
 
+@app.route('/api/forecast/batch', methods=['POST'])
+def api_forecast_batch():
+    """
+    Forecast many locations in one call, streamed back as NDJSON.
+    
+    Expects {"queries": [...], "days": 7}. Each input query gets one line,
+    {"index", "query", "forecast"} or {"index", "query", "error"}, written
+    as soon as its location completes, so lines arrive out of order.
+    """
+    data = request.get_json(silent=True)
+    if not data:
+        return jsonify({'error': 'No data provided'}), 400
+    
+    queries = data.get('queries') or data.get('locations')
+    if not isinstance(queries, list) or not queries:
+        return jsonify({'error': 'queries must be a non-empty list'}), 400
+    if len(queries) > BATCH_MAX_QUERIES:
+        return jsonify({'error': f'At most {BATCH_MAX_QUERIES} queries per batch'}), 400
+    
+    try:
+        days = int(data.get('days', 7))
+    except (TypeError, ValueError):
+        return jsonify({'error': 'days must be an integer'}), 400
+    
+    valid, invalid = [], []
+    for i, query in enumerate(queries):
+        (valid if isinstance(query, str) and query.strip() else invalid).append(i)
+    
+    def generate():
+        for i in invalid:
+            yield json.dumps({'index': i, 'query': queries[i],
+                              'error': 'Query must be a non-empty string'}) + '\n'
+        
+        batch = [queries[i].strip() for i in valid]
+        for indices, forecast_data in forecast_engine.iter_batch(batch, days):
+            for j in indices:
+                line = {'index': valid[j], 'query': queries[valid[j]]}
+                if 'error' in forecast_data:
+                    line['error'] = forecast_data['error']
+                else:
+                    line['forecast'] = forecast_data
+                yield json.dumps(line) + '\n'
+    
+    return Response(stream_with_context(generate()), mimetype='application/x-ndjson')
+
+
+@app.route('/api/cache/stats')
+def api_cache_stats():
+    """Report response cache and request coalescing counters for tuning."""
+    stats = forecast_engine.fetcher.cache_stats()
+    stats['inflight'] = forecast_engine.inflight.stats()
+    stats['pages'] = page_cache.stats()
+    return jsonify(stats)
+
+
 @app.route('/upload-json', methods=['POST'])
 def upload_json():
-    """Handle JSON file upload."""
+    """Analyze an uploaded JSON or NDJSON file and return a summary."""
     try:
         if 'json_file' not in request.files:
             return jsonify({'error': 'No file uploaded'}), 400
@@ -203,17 +550,16 @@ def upload_json():
         if file.filename == '':
             return jsonify({'error': 'No file selected'}), 400
         
-        if not file.filename.endswith('.json'):
+        if not file.filename.endswith(UPLOAD_EXTENSIONS):
             return jsonify({'error': 'File must be JSON'}), 400
         
-        # Parse JSON content
-        content = file.read().decode('utf-8')
-        json_data = json.loads(content)
+        # Parse incrementally; only the aggregate is returned
+        summary = forecast_engine.process_json_stream(file.stream)
+        if 'error' in summary:
+            return jsonify(summary), 400
         
-        return jsonify({'success': True, 'data': json_data})
+        return jsonify({'success': True, 'summary': summary})
     
-    except json.JSONDecodeError:
-        return jsonify({'error': 'Invalid JSON format'}), 400
     except Exception as e:
         return jsonify({'error': str(e)}), 500
 
@@ -303,7 +649,7 @@ def easter_egg_portal():
     
     # Get project stats
     stats = {
-        'total_forecasts': len(ForecastResult.get_all_with_requests(limit=1000)),
+        'total_forecasts': ForecastResult.count(),
         'python_files': len(list(base_path.glob('*.py'))),
         'templates': len(list((base_path / 'templates').glob('*.html'))) if (base_path / 'templates').exists() else 0,
         'static_files': len(list((base_path / 'static').glob('*.*'))) if (base_path / 'static').exists() else 0,
@@ -461,4 +807,4 @@ def download_file(file_type, file_name):
 
 
 if __name__ == '__main__':
-    app.run(debug=True, host='0.0.0.0', port=5000)
+    create_app().run(debug=True, host='0.0.0.0', port=5000)
@@ -0,0 +1,309 @@
+"""
+Galaxy Weather - Benchmarks
+Micro-benchmarks for performance-sensitive paths of the application.
+Run `python benchmarks.py <name>`, or with no name to run them all.
+"""
+
+import os
+import sqlite3
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+import tracemalloc
+from pathlib import Path
+
+BASE_DIR = Path(__file__).parent
+
+
+def _run_timed(code, runs):
+    """Run a snippet in fresh interpreters and return its printed timings (ms)."""
+    timings = []
+    for _ in range(runs):
+        output = subprocess.run([sys.executable, '-c', code], cwd=BASE_DIR,
+                                capture_output=True, text=True, check=True).stdout
+        timings.append(float(output.strip().splitlines()[-1]))
+    return timings
+
+
+def _report(label, timings):
+    print(f"  {label:<34} median {statistics.median(timings):8.2f} ms"
+          f"   min {min(timings):8.2f} ms")
+
+
+def bench_startup(runs=15):
+    """
+    Measure worker boot cost: importing modules and bootstrapping the app.
+
+    Each sample runs in a fresh interpreter, like a newly forked worker,
+    against a throwaway database that is already migrated (the warm case).
+    """
+    print("Startup (fresh interpreter per sample)")
+    with tempfile.TemporaryDirectory() as tmp:
+        db_path = os.path.join(tmp, 'bench.db')
+        prologue = f"import time, models\nmodels.DATABASE_PATH = {db_path!r}\n"
+        subprocess.run([sys.executable, '-c', prologue + "models.init_db()"],
+                       cwd=BASE_DIR, check=True)
+
+        _report('import models', _run_timed(
+            "import time\nt = time.perf_counter()\nimport models\n"
+            "print((time.perf_counter() - t) * 1000)", runs))
+        _report('import app', _run_timed(
+            "import time\nt = time.perf_counter()\nimport app\n"
+            "print((time.perf_counter() - t) * 1000)", runs))
+        _report('create_app() on migrated db', _run_timed(
+            prologue + "import app\nt = time.perf_counter()\napp.create_app()\n"
+            "print((time.perf_counter() - t) * 1000)", runs))
+
+
+class _DictForecastResult:
+    """The pre-slots ForecastResult shape, kept here as the comparison baseline."""
+
+    def __init__(self, id=None, request_id=None, location_name=None, country=None,
+                 latitude=None, longitude=None, forecast_data=None, current_temp=None,
+                 current_humidity=None, current_condition=None, created_at=None):
+        self.id = id
+        self.request_id = request_id
+        self.location_name = location_name
+        self.country = country
+        self.latitude = latitude
+        self.longitude = longitude
+        self.forecast_data = forecast_data
+        self.current_temp = current_temp
+        self.current_humidity = current_humidity
+        self.current_condition = current_condition
+        self.created_at = created_at
+
+
+def _build_dict_results(rows):
+    results = []
+    for row in rows:
+        result = _DictForecastResult(
+            id=row['id'],
+            request_id=row['request_id'],
+            location_name=row['location_name'],
+            country=row['country'],
+            latitude=row['latitude'],
+            longitude=row['longitude'],
+            forecast_data=None,
+            current_temp=row['current_temp'],
+            current_humidity=row['current_humidity'],
+            current_condition=row['current_condition'],
+            created_at=row['created_at']
+        )
+        result.query = row['query']
+        result.range_days = row['range_days']
+        result.request_status = row['request_status']
+        results.append(result)
+    return results
+
+
+def bench_rows(count=10000, runs=7):
+    """
+    Compare building listing rows as __dict__ objects by column name versus
+    slotted ForecastResult objects through the generated row mapper.
+    """
+    import models
+
+    conn = sqlite3.connect(':memory:')
+    conn.row_factory = sqlite3.Row
+    conn.execute('''
+        CREATE TABLE listing (
+            id INTEGER PRIMARY KEY, request_id INTEGER, location_name TEXT, country TEXT,
+            latitude REAL, longitude REAL, current_temp REAL, current_humidity REAL,
+            current_condition TEXT, created_at TEXT, query TEXT, range_days INTEGER,
+            request_status TEXT
+        )
+    ''')
+    conn.executemany(
+        'INSERT INTO listing VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)',
+        [(i, i, f'City {i}', 'Country', 51.5, -0.12, 12.5, 71.0, 'Partly cloudy',
+          '2026-01-01 12:00:00', f'city {i}', 7, 'completed') for i in range(count)]
+    )
+    rows = conn.execute('SELECT * FROM listing').fetchall()
+    mapper = models.row_mapper(models.ForecastResult, rows[0].keys())
+
+    builders = {
+        '__dict__ objects by column name': lambda: _build_dict_results(rows),
+        '__slots__ objects via row_mapper': lambda: [mapper(row) for row in rows],
+    }
+
+    print(f"Row mapping ({count} listing rows)")
+    for label, build in builders.items():
+        timings = []
+        for _ in range(runs):
+            start = time.perf_counter()
+            build()
+            timings.append((time.perf_counter() - start) * 1000)
+
+        tracemalloc.start()
+        objects = build()
+        size = tracemalloc.get_traced_memory()[0]
+        tracemalloc.stop()
+        del objects
+
+        print(f"  {label:<34} median {statistics.median(timings):8.2f} ms"
+              f"   retained {size / 1024:8.1f} KiB")
+
+
+def _time_ms(fn, runs):
+    timings = []
+    for _ in range(runs):
+        start = time.perf_counter()
+        fn()
+        timings.append((time.perf_counter() - start) * 1000)
+    return timings
+
+
+def bench_stats(count=200000, chunks=8, runs=5):
+    """
+    Time the single-pass upload aggregate and check that merging per-chunk
+    states gives the same result as one pass over all readings.
+    """
+    import math
+    import random
+    from stats import ReadingStats
+
+    rng = random.Random(7)
+    readings = [{'temperature': 15 + 0.0001 * i + rng.uniform(-5, 5),
+                 'humidity': rng.uniform(30, 90)} for i in range(count)]
+
+    whole = ReadingStats().update(readings)
+    size = -(-count // chunks)
+    states = [ReadingStats().update(readings[start:start + size])
+              for start in range(0, count, size)]
+
+    def merge_states():
+        merged = ReadingStats()
+        for state in states:
+            merged.merge(state)
+        return merged
+
+    merged = merge_states()
+
+    for name in ('temperature', 'humidity'):
+        a, b = getattr(whole, name), getattr(merged, name)
+        assert a.count == b.count and a.min == b.min and a.max == b.max
+        for field in ('mean', 'variance', 'slope'):
+            assert math.isclose(getattr(a, field), getattr(b, field),
+                                rel_tol=1e-9, abs_tol=1e-12), (name, field)
+
+    print(f"Reading statistics ({count} readings)")
+    _report('single pass', _time_ms(lambda: ReadingStats().update(readings), runs))
+    _report(f'merge of {chunks} chunk states', _time_ms(merge_states, runs))
+    print("  merged states match the single pass")
+
+
+def bench_parallel(count=400000, processes=None, runs=3):
+    """
+    Compare reducing a large upload in-process with the chunked process pool
+    (UPLOAD_PROCESSES, defaulting to the CPU count), checking both agree.
+    """
+    import math
+    import random
+    import forecast
+
+    processes = processes or forecast.UPLOAD_PROCESSES or os.cpu_count() or 1
+    rng = random.Random(11)
+    readings = [{'temperature': 15 + rng.uniform(-5, 5), 'humidity': rng.uniform(30, 90)}
+                for _ in range(count)]
+
+    serial = forecast.ForecastEngine(upload_processes=0)
+    parallel = forecast.ForecastEngine(upload_processes=processes)
+    parallel._process_weather_list(readings[:forecast.UPLOAD_PARALLEL_THRESHOLD])  # start the pool
+
+    expected = serial._process_weather_list(readings)['analysis']
+    actual = parallel._process_weather_list(readings)['analysis']
+    for key, value in expected.items():
+        assert math.isclose(value, actual[key], rel_tol=1e-9, abs_tol=1e-9), key
+
+    print(f"Upload reduction ({count} readings, {processes} processes)")
+    _report('in-process', _time_ms(lambda: serial._process_weather_list(readings), runs))
+    _report('process pool', _time_ms(lambda: parallel._process_weather_list(readings), runs))
+    print("  results match")
+
+
+def _legacy_detect_query_type(query):
+    """The previous detect_query_type, kept here as the comparison baseline."""
+    import re
+
+    query = query.strip()
+    if re.match(r'^(\d{1,3}\.){3}\d{1,3}$', query):
+        return 'ip'
+    if re.match(r'^-?\d+\.?\d*\s*,\s*-?\d+\.?\d*$', query):
+        return 'coordinates'
+    if re.match(r'^\d{5}(-\d{4})?$', query):
+        return 'postal_us'
+    if re.match(r'^[A-Z]{1,2}\d[A-Z\d]?\s*\d[A-Z]{2}$', query, re.IGNORECASE):
+        return 'postal_uk'
+    if re.match(r'^[A-Z]\d[A-Z]\s*\d[A-Z]\d$', query, re.IGNORECASE):
+        return 'postal_ca'
+    return 'city'
+
+
+def _query_corpus(count, seed=3):
+    """Form-style queries: mostly popular cities, skewed so repeats are common."""
+    import random
+
+    rng = random.Random(seed)
+    cities = ['London', 'Paris', 'New York', 'Tokyo', 'Berlin', 'Sydney', 'Toronto',
+              'São Paulo', 'Mumbai', 'Cairo', 'Mexico City', 'Lagos', 'Seoul']
+    variants = [lambda q: q, str.lower, str.upper, lambda q: f'  {q} ']
+    others = [
+        lambda: f'{rng.uniform(-90, 90):.{rng.choice((2, 4, 6))}f},{rng.uniform(-180, 180):.4f}',
+        lambda: '.'.join(str(rng.randint(1, 254)) for _ in range(4)),
+        lambda: f'{rng.randint(10000, 99999)}',
+        lambda: rng.choice(['SW1A 1AA', 'EC1A 1BB', 'M1 1AE', 'sw1a1aa']),
+        lambda: rng.choice(['M5V 3L9', 'K1A 0B1', 'h2x1y4']),
+    ]
+    corpus = []
+    for _ in range(count):
+        if rng.random() < 0.8:
+            city = cities[min(int(rng.expovariate(0.4)), len(cities) - 1)]
+            corpus.append(rng.choice(variants)(city))
+        else:
+            corpus.append(rng.choice(others)())
+    return corpus
+
+
+def bench_queries(count=50000, runs=5):
+    """
+    Compare the regex-per-pattern classifier with the precompiled, memoized
+    one over a realistic query mix, checking both classify identically.
+    """
+    import forecast
+
+    corpus = _query_corpus(count)
+    uncached = forecast._classify.__wrapped__
+    for query in corpus:
+        assert forecast.detect_query_type(query) == _legacy_detect_query_type(query), query
+
+    print(f"Query classification ({count} queries, {len(set(corpus))} distinct)")
+    _report('previous detect_query_type', _time_ms(
+        lambda: [_legacy_detect_query_type(q) for q in corpus], runs))
+    _report('single pattern, uncached', _time_ms(
+        lambda: [uncached(q.strip())[0] for q in corpus], runs))
+    _report('detect_query_type (memoized)', _time_ms(
+        lambda: [forecast.detect_query_type(q) for q in corpus], runs))
+    _report('normalize_query (memoized)', _time_ms(
+        lambda: [forecast.normalize_query(q) for q in corpus], runs))
+    print("  classifications match")
+
+
+BENCHMARKS = {
+    'startup': bench_startup,
+    'rows': bench_rows,
+    'stats': bench_stats,
+    'parallel': bench_parallel,
+    'queries': bench_queries,
+}
+
+
+if __name__ == '__main__':
+    names = sys.argv[1:] or list(BENCHMARKS)
+    for name in names:
+        if name not in BENCHMARKS:
+            sys.exit(f"Unknown benchmark '{name}'. Available: {', '.join(BENCHMARKS)}")
+        BENCHMARKS[name]()
+        print()
@@ -0,0 +1,183 @@
+"""
+Galaxy Weather - Response Caching
+In-process TTL/LRU cache for WeatherAPI responses with an optional SQLite tier,
+and single-flight coalescing of identical in-flight work.
+"""
+
+import threading
+import time
+from collections import OrderedDict
+
+
+class TTLCache:
+    """
+    Thread-safe LRU cache whose entries expire after a time-to-live.
+
+    An optional persistent store (any object with get(key) returning
+    (value, expires_at) or None, and set(key, value, expires_at)) acts as a
+    second tier shared between processes. Memory misses fall through to
+    the store and store hits are promoted back into memory.
+    """
+
+    def __init__(self, maxsize=256, ttl=300, store=None, name='cache'):
+        self.maxsize = maxsize
+        self.ttl = ttl
+        self.store = store
+        self.name = name
+        self._data = OrderedDict()
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+        self.store_hits = 0
+
+    def get(self, key):
+        """
+        Return the cached value for key, or None on a miss.
+
+        Args:
+            key: Cache key
+
+        Returns:
+            Cached value or None
+        """
+        now = time.time()
+        with self._lock:
+            entry = self._data.get(key)
+            if entry is not None:
+                value, expires_at = entry
+                if expires_at > now:
+                    self._data.move_to_end(key)
+                    self.hits += 1
+                    return value
+                del self._data[key]
+
+        if self.store is not None:
+            stored = self.store.get(f'{self.name}:{key}')
+            if stored is not None and stored[1] > now:
+                value, expires_at = stored
+                with self._lock:
+                    self._put(key, value, expires_at)
+                    self.hits += 1
+                    self.store_hits += 1
+                return value
+
+        with self._lock:
+            self.misses += 1
+        return None
+
+    def set(self, key, value, ttl=None):
+        """
+        Store a value under key for ttl seconds (defaults to the cache TTL).
+
+        Args:
+            key: Cache key
+            value: Value to cache; must be JSON serializable with a store
+            ttl: Optional per-entry time-to-live in seconds
+        """
+        expires_at = time.time() + (self.ttl if ttl is None else ttl)
+        with self._lock:
+            self._put(key, value, expires_at)
+        if self.store is not None:
+            self.store.set(f'{self.name}:{key}', value, expires_at)
+
+    def _put(self, key, value, expires_at):
+        """Insert an entry and evict the least recently used ones (lock held)."""
+        self._data[key] = (value, expires_at)
+        self._data.move_to_end(key)
+        while len(self._data) > self.maxsize:
+            self._data.popitem(last=False)
+
+    def clear(self):
+        """Drop all in-memory entries and reset the counters."""
+        with self._lock:
+            self._data.clear()
+            self.hits = self.misses = self.store_hits = 0
+
+    def stats(self):
+        """Return hit/miss counters and sizing for tuning."""
+        with self._lock:
+            lookups = self.hits + self.misses
+            return {
+                'name': self.name,
+                'hits': self.hits,
+                'misses': self.misses,
+                'store_hits': self.store_hits,
+                'hit_rate': round(self.hits / lookups, 4) if lookups else 0,
+                'size': len(self._data),
+                'maxsize': self.maxsize,
+                'ttl': self.ttl
+            }
+
+
+class SingleFlight:
+    """
+    Coalesces concurrent calls that share a key into one execution.
+
+    The first caller for a key (the leader) runs the function; callers that
+    arrive while it is in flight wait and receive the same result, or the
+    same exception. Nothing is cached once the call completes.
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._calls = {}
+        self.leaders = 0
+        self.followers = 0
+
+    def do(self, key, fn, *args, **kwargs):
+        """
+        Run fn(*args, **kwargs) once per concurrent group of callers for key.
+
+        Args:
+            key: Hashable deduplication key
+            fn: Callable to execute
+
+        Returns:
+            The result of the shared call
+        """
+        with self._lock:
+            call = self._calls.get(key)
+            if call is None:
+                call = self._calls[key] = _Call()
+                self.leaders += 1
+                leader = True
+            else:
+                self.followers += 1
+                leader = False
+
+        if not leader:
+            call.done.wait()
+            if call.error is not None:
+                raise call.error
+            return call.result
+
+        try:
+            call.result = fn(*args, **kwargs)
+            return call.result
+        except BaseException as e:
+            call.error = e
+            raise
+        finally:
+            with self._lock:
+                del self._calls[key]
+            call.done.set()
+
+    def stats(self):
+        """Return how many calls ran and how many were coalesced."""
+        with self._lock:
+            return {
+                'leaders': self.leaders,
+                'followers': self.followers,
+                'in_flight': len(self._calls)
+            }
+
+
+class _Call:
+    """State of one in-flight SingleFlight call."""
+
+    __slots__ = ('done', 'result', 'error')
+
+    def __init__(self):
+        self.done = threading.Event()
+        self.result = None
+        self.error = None
@@ -0,0 +1,113 @@
+"""
+Galaxy Weather - Storage Codecs
+Versioned, compressed encodings for ForecastResult.forecast_data.
+"""
+
+import json
+import os
+import zlib
+
+try:
+    import zstandard
+except ImportError:  # optional dependency
+    zstandard = None
+
+# Encoded values start with MAGIC followed by one codec id byte; anything
+# else is treated as a legacy plain JSON text value.
+MAGIC = b'GW'
+
+
+class ZlibJsonCodec:
+    """Compact JSON compressed with zlib (standard library only)."""
+
+    codec_id = 1
+    name = 'zlib'
+
+    def __init__(self, level=6):
+        self.level = level
+
+    def encode(self, data):
+        return zlib.compress(_dump(data), self.level)
+
+    def decode(self, payload):
+        return json.loads(zlib.decompress(payload))
+
+
+class ZstdJsonCodec:
+    """Compact JSON compressed with Zstandard (requires `zstandard`)."""
+
+    codec_id = 2
+    name = 'zstd'
+
+    def __init__(self, level=9):
+        self.level = level
+
+    def encode(self, data):
+        return zstandard.ZstdCompressor(level=self.level).compress(_dump(data))
+
+    def decode(self, payload):
+        return json.loads(zstandard.ZstdDecompressor().decompress(payload))
+
+
+def _dump(data):
+    """Serialize to compact UTF-8 JSON bytes."""
+    return json.dumps(data, separators=(',', ':')).encode('utf-8')
+
+
+CODECS = {codec.codec_id: codec for codec in (ZlibJsonCodec(), ZstdJsonCodec())}
+CODECS_BY_NAME = {codec.name: codec for codec in CODECS.values()}
+
+
+def get_default_codec():
+    """Return the codec named by FORECAST_CODEC, falling back to zlib."""
+    name = os.getenv('FORECAST_CODEC', 'zlib')
+    if name == 'zstd' and zstandard is None:
+        name = 'zlib'
+    return CODECS_BY_NAME.get(name, CODECS_BY_NAME['zlib'])
+
+
+def encode(data, codec=None):
+    """
+    Encode a JSON-serializable value for storage.
+
+    Args:
+        data: Value to store (typically the forecast dict)
+        codec: Codec instance; defaults to get_default_codec()
+
+    Returns:
+        bytes: MAGIC + codec id + compressed payload
+    """
+    codec = codec or get_default_codec()
+    return MAGIC + bytes([codec.codec_id]) + codec.encode(data)
+
+
+def is_encoded(value):
+    """Check whether a stored value uses a versioned codec."""
+    return isinstance(value, (bytes, bytearray, memoryview)) and bytes(value[:2]) == MAGIC
+
+
+def decode(value):
+    """
+    Decode a stored value written by encode(), or a legacy JSON text value.
+
+    Args:
+        value: Stored column value (bytes, str or None)
+
+    Returns:
+        Decoded value, or None for NULL
+    """
+    if value is None:
+        return None
+    if isinstance(value, str):
+        return json.loads(value)
+
+    value = bytes(value)
+    if value[:2] != MAGIC:
+        return json.loads(value.decode('utf-8'))
+
+    codec = CODECS.get(value[2])
+    if codec is None:
+        raise ValueError(f'Unknown forecast_data codec id {value[2]}')
+    if codec.name == 'zstd' and zstandard is None:
+        raise RuntimeError('forecast_data is zstd-encoded; install zstandard to read it')
+    return codec.decode(value[3:])
@@ -4,26 +4,218 @@ Implements weather data fetching and forecasting logic using moving averages and
 """
 
 import os
+import random
 import requests
 import json
-from datetime import datetime, timedelta
-from dotenv import load_dotenv
+import multiprocessing
+import re
+import threading
+from collections import deque
+from functools import lru_cache
+from itertools import chain, islice
+from concurrent.futures import Future, ProcessPoolExecutor, ThreadPoolExecutor, as_completed
+from datetime import datetime, timedelta, timezone
+from requests.adapters import HTTPAdapter
+from urllib3.util.retry import Retry
 
-load_dotenv()
+import geo
+import ingest
+from cache import SingleFlight, TTLCache
+from stats import ReadingStats, summarize_readings
+from models import ForecastResult, HistoricalCache, LocationAlias, ResponseCache
 
-WEATHERAPI_KEY = os.getenv('WEATHERAPI_KEY')
 WEATHERAPI_BASE_URL = 'http://api.weatherapi.com/v1'
+# Upper bound on concurrent upstream calls; 0 fetches sequentially
+WEATHERAPI_MAX_WORKERS = int(os.getenv('WEATHERAPI_MAX_WORKERS', 9))
+# Keep-alive connections kept open to WeatherAPI
+WEATHERAPI_POOL_SIZE = int(os.getenv('WEATHERAPI_POOL_SIZE', 16))
+WEATHERAPI_RETRIES = int(os.getenv('WEATHERAPI_RETRIES', 3))
+WEATHERAPI_BACKOFF = float(os.getenv('WEATHERAPI_BACKOFF', 0.5))
+RETRY_STATUSES = (429, 500, 502, 503, 504)
+# Response cache: current conditions change faster than forecasts
+CURRENT_CACHE_TTL = int(os.getenv('CURRENT_CACHE_TTL', 300))
+FORECAST_CACHE_TTL = int(os.getenv('FORECAST_CACHE_TTL', 1800))
+RESPONSE_CACHE_SIZE = int(os.getenv('RESPONSE_CACHE_SIZE', 512))
+RESPONSE_CACHE_SQLITE = os.getenv('RESPONSE_CACHE_SQLITE', '0') == '1'
+# Distinct queries whose classification and cache key are memoized
+QUERY_CACHE_SIZE = int(os.getenv('QUERY_CACHE_SIZE', 4096))
+# Decimal places coordinate queries are rounded to in cache keys (4 ~ 11 m)
+COORDINATE_PRECISION = int(os.getenv('COORDINATE_PRECISION', 4))
+# Seconds a named query's grid cell (or lack of one) is remembered in memory
+LOCATION_ALIAS_TTL = int(os.getenv('LOCATION_ALIAS_TTL', 3600))
+# Query types that never map to a fixed place (an IP's location can change)
+UNALIASED_QUERY_TYPES = ('coordinates', 'ip')
+# Stored forecasts within this distance (km) and age (seconds) of a query's
+# position are reused instead of calling upstream; 0 disables either
+NEARBY_RADIUS_KM = float(os.getenv('NEARBY_RADIUS_KM', 5))
+NEARBY_MAX_AGE = int(os.getenv('NEARBY_MAX_AGE', 1800))
+# Forecasts generated concurrently for batch requests, per process
+BATCH_MAX_CONCURRENCY = int(os.getenv('BATCH_MAX_CONCURRENCY', 8))
+# Processes for reducing large uploads in parallel; 0 keeps it in-process
+UPLOAD_PROCESSES = int(os.getenv('UPLOAD_PROCESSES', 0))
+# Uploads with fewer readings than this are always reduced in-process
+UPLOAD_PARALLEL_THRESHOLD = int(os.getenv('UPLOAD_PARALLEL_THRESHOLD', 100000))
+UPLOAD_CHUNK_READINGS = int(os.getenv('UPLOAD_CHUNK_READINGS', 25000))
+
+
+class JitteredRetry(Retry):
+    """Retry policy with full jitter on the exponential backoff."""
+    
+    def get_backoff_time(self):
+        return random.uniform(0, super().get_backoff_time())
+
+
+def create_session(pool_size=None, retries=None, backoff=None):
+    """
+    Build a pooled HTTP session for WeatherAPI calls.
+    
+    Connections are kept alive and reused, and idempotent GETs are retried
+    with jittered exponential backoff on connection errors, 429 and 5xx.
+    The underlying urllib3 pool is thread safe, so one session can be
+    shared by all Flask worker threads.
+    
+    Args:
+        pool_size: Maximum connections kept open per host
+        retries: Maximum retries per request
+        backoff: Backoff factor in seconds
+        
+    Returns:
+        requests.Session: Configured session
+    """
+    pool_size = WEATHERAPI_POOL_SIZE if pool_size is None else pool_size
+    retry = JitteredRetry(
+        total=WEATHERAPI_RETRIES if retries is None else retries,
+        backoff_factor=WEATHERAPI_BACKOFF if backoff is None else backoff,
+        status_forcelist=RETRY_STATUSES,
+        allowed_methods=frozenset(['GET']),
+        respect_retry_after_header=True,
+        raise_on_status=False
+    )
+    adapter = HTTPAdapter(pool_connections=2, pool_maxsize=pool_size, max_retries=retry)
+    
+    session = requests.Session()
+    session.mount('http://', adapter)
+    session.mount('https://', adapter)
+    return session
 
 
 class WeatherDataFetcher:
     """Fetches weather data from WeatherAPI."""
     
-    def __init__(self, api_key=None):
-        self.api_key = api_key or WEATHERAPI_KEY
+    def __init__(self, api_key=None, use_history_cache=True, max_workers=None, session=None):
+        self.api_key = api_key or os.getenv('WEATHERAPI_KEY')
+        self.session = session or create_session(
+            pool_size=max(WEATHERAPI_POOL_SIZE, max_workers or WEATHERAPI_MAX_WORKERS)
+        )
+        self.use_history_cache = use_history_cache
+        store = ResponseCache if RESPONSE_CACHE_SQLITE else None
+        self.current_cache = TTLCache(RESPONSE_CACHE_SIZE, CURRENT_CACHE_TTL, store, 'current')
+        self.forecast_cache = TTLCache(RESPONSE_CACHE_SIZE, FORECAST_CACHE_TTL, store, 'forecast')
+        self.aliases = TTLCache(QUERY_CACHE_SIZE, LOCATION_ALIAS_TTL, name='aliases')
+        self.max_workers = WEATHERAPI_MAX_WORKERS if max_workers is None else max_workers
+        self._executor = None
+        if self.max_workers > 0:
+            self._executor = ThreadPoolExecutor(max_workers=self.max_workers,
+                                                thread_name_prefix='weatherapi')
+    
+    def submit(self, fn, *args, **kwargs):
+        """
+        Schedule a fetcher call on the bounded thread pool.
         
+        Falls back to running the call inline when concurrency is disabled.
+        Callers must not submit from inside a pool task and wait on the
+        result, since that can exhaust the pool.
+        
+        Returns:
+            Future: Future resolving to the call result
+        """
+        if self._executor is not None:
+            return self._executor.submit(fn, *args, **kwargs)
+        
+        future = Future()
+        try:
+            future.set_result(fn(*args, **kwargs))
+        except Exception as e:
+            future.set_exception(e)
+        return future
+        
+    def cache_stats(self):
+        """Return hit/miss counters of the response caches."""
+        return {
+            'current': self.current_cache.stats(),
+            'forecast': self.forecast_cache.stats(),
+            'aliases': self.aliases.stats()
+        }
+    
+    def location_key(self, query):
+        """
+        Return the canonical cache key of the place a query refers to.
+        
+        Coordinates snap to their geohash grid cell. Named queries (cities,
+        postal codes) map to the cell they resolved to the first time
+        WeatherAPI answered for them, so "London", "london" and a GPS fix in
+        central London share cache entries. Until then, and for IP queries,
+        the normalized query is the key.
+        
+        Args:
+            query: Location query string
+            
+        Returns:
+            str: "geo:<geohash>" or a normalize_query() key
+        """
+        return self._resolve(query)[0]
+    
+    def location_position(self, query):
+        """
+        Return the (latitude, longitude) a query refers to, when known.
+        
+        Known for coordinate queries and for named queries that have been
+        resolved before; None otherwise.
+        """
+        _, lat, lon = self._resolve(query)
+        return None if lat is None else (lat, lon)
+    
+    def _resolve(self, query):
+        """Return (location key, latitude, longitude) for a query."""
+        key = normalize_query(query)
+        query_type, _, normalized = key.partition(':')
+        if query_type == 'coordinates':
+            lat, lon = (float(part) for part in normalized.split(','))
+            if not geo.LOCATION_GEOHASH_PRECISION:
+                return key, lat, lon
+            return geo.location_key(lat, lon), lat, lon
+        if query_type in UNALIASED_QUERY_TYPES or not geo.LOCATION_GEOHASH_PRECISION:
+            return key, None, None
+        
+        resolved = self.aliases.get(key)
+        if resolved is None:
+            resolved = LocationAlias.get(key)
+            if resolved:
+                self.aliases.set(key, resolved)
+            else:
+                # Remember unresolved queries briefly so other processes' aliases show up
+                resolved = (key, None, None)
+                self.aliases.set(key, resolved, ttl=60)
+        return resolved
+    
+    def _remember_location(self, query, data):
+        """Learn the grid cell a named query resolved to from an API response."""
+        location = (data or {}).get('location') or {}
+        lat, lon = location.get('lat'), location.get('lon')
+        if lat is None or lon is None or not geo.LOCATION_GEOHASH_PRECISION:
+            return
+        
+        key = normalize_query(query)
+        if key.partition(':')[0] in UNALIASED_QUERY_TYPES:
+            return
+        resolved = (geo.location_key(lat, lon), lat, lon)
+        if tuple(self.aliases.get(key) or ()) != resolved:
+            LocationAlias.save(key, *resolved)
+            self.aliases.set(key, resolved)
+    
     def get_current(self, query):
         """
-        Fetch current weather data.
+        Fetch current weather data, served from the response cache when fresh.
         
         Args:
             query: City name, lat/lon, IP address, or postal code
@@ -31,6 +223,16 @@ class WeatherDataFetcher:
         Returns:
             dict: Current weather data or None if error
         """
+        data = self.current_cache.get(self.location_key(query))
+        if data is None:
+            data = self._fetch_current(query)
+            if data is not None:
+                # The response may have just resolved the query's grid cell
+                self.current_cache.set(self.location_key(query), data)
+        return data
+    
+    def _fetch_current(self, query):
+        """Fetch current weather data from the API."""
         try:
             url = f"{WEATHERAPI_BASE_URL}/current.json"
             params = {
@@ -38,16 +240,19 @@ class WeatherDataFetcher:
                 'q': query,
                 'aqi': 'yes'
             }
-            response = requests.get(url, params=params, timeout=10)
+            response = self.session.get(url, params=params, timeout=10)
             response.raise_for_status()
-            return response.json()
+            data = response.json()
         except requests.RequestException as e:
             print(f"Error fetching current weather: {e}")
             return None
+        
+        self._remember_location(query, data)
+        return data
     
     def get_forecast(self, query, days=10):
         """
-        Fetch weather forecast data.
+        Fetch weather forecast data, served from the response cache when fresh.
         
         Args:
             query: Location query
@@ -56,6 +261,15 @@ class WeatherDataFetcher:
         Returns:
             dict: Forecast data or None if error
         """
+        data = self.forecast_cache.get(f"{self.location_key(query)}|{min(days, 10)}")
+        if data is None:
+            data = self._fetch_forecast(query, days)
+            if data is not None:
+                self.forecast_cache.set(f"{self.location_key(query)}|{min(days, 10)}", data)
+        return data
+    
+    def _fetch_forecast(self, query, days):
+        """Fetch weather forecast data from the API."""
         try:
             url = f"{WEATHERAPI_BASE_URL}/forecast.json"
             params = {
@@ -65,17 +279,23 @@ class WeatherDataFetcher:
                 'aqi': 'yes',
                 'alerts': 'yes'
             }
-            response = requests.get(url, params=params, timeout=10)
+            response = self.session.get(url, params=params, timeout=10)
             response.raise_for_status()
-            return response.json()
+            data = response.json()
         except requests.RequestException as e:
             print(f"Error fetching forecast: {e}")
             return None
+        
+        self._remember_location(query, data)
+        return data
     
     def get_history(self, query, date):
         """
         Fetch historical weather data for a specific date.
         
+        Completed days are served from the historical_cache table when
+        available, and stored there after a successful fetch.
+        
         Args:
             query: Location query
             date: Date string in YYYY-MM-DD format
@@ -83,6 +303,15 @@ class WeatherDataFetcher:
         Returns:
             dict: Historical weather data or None if error
         """
+        if self.use_history_cache:
+            cached = HistoricalCache.get(self.location_key(query), date)
+            if cached:
+                return cached
+        
+        return self._fetch_history(query, date)
+    
+    def _fetch_history(self, query, date):
+        """Fetch one history day from the API and cache it if complete."""
         try:
             url = f"{WEATHERAPI_BASE_URL}/history.json"
             params = {
@@ -90,30 +319,64 @@ class WeatherDataFetcher:
                 'q': query,
                 'dt': date
             }
-            response = requests.get(url, params=params, timeout=10)
+            response = self.session.get(url, params=params, timeout=10)
             response.raise_for_status()
-            return response.json()
+            data = response.json()
         except requests.RequestException as e:
             print(f"Error fetching history for {date}: {e}")
             return None
+        
+        self._remember_location(query, data)
+        if self.use_history_cache and self._is_completed_day(data, date):
+            HistoricalCache.save(self.location_key(query), date, data)
+        return data
+    
+    @staticmethod
+    def _is_completed_day(data, date):
+        """Check whether a date is already over at the queried location."""
+        localtime = (data or {}).get('location', {}).get('localtime')
+        local_date = localtime.split(' ')[0] if localtime else datetime.now().strftime('%Y-%m-%d')
+        return date < local_date
     
     def get_history_range(self, query, days_back=7):
         """
         Fetch historical data for multiple past days.
         
+        Cached days are read in a single query; only missing dates are
+        fetched from the API, concurrently.
+        
         Args:
             query: Location query
             days_back: Number of days to look back
             
         Returns:
-            list: List of historical data dicts
+            list: List of historical data dicts, most recent day first
+        """
+        return self.collect_history(self.submit_history_range(query, days_back))
+    
+    def submit_history_range(self, query, days_back=7):
+        """
+        Start fetching the past days that are not cached yet.
+        
+        Returns:
+            list: (date, cached data or Future) pairs, most recent day first
         """
-        historical_data = []
         today = datetime.now()
+        dates = [(today - timedelta(days=i)).strftime('%Y-%m-%d')
+                 for i in range(1, days_back + 1)]
         
-        for i in range(1, days_back + 1):
-            date = (today - timedelta(days=i)).strftime('%Y-%m-%d')
-            data = self.get_history(query, date)
+        cached = HistoricalCache.get_many(self.location_key(query), dates) if self.use_history_cache else {}
+        
+        return [(date, cached.get(date) or self.submit(self._fetch_history, query, date))
+                for date in dates]
+    
+    @staticmethod
+    def collect_history(pending):
+        """Wait for submitted history days and return them in date order."""
+        historical_data = []
+        for _, data in pending:
+            if isinstance(data, Future):
+                data = data.result()
             if data:
                 historical_data.append(data)
         
@@ -126,8 +389,16 @@ class ForecastEngine:
     Implements moving average and linear trend forecasting.
     """
     
-    def __init__(self):
+    def __init__(self, upload_processes=None):
         self.fetcher = WeatherDataFetcher()
+        self.inflight = SingleFlight()
+        # Separate from the fetcher's pool, whose workers the forecasts use
+        self.batch_executor = ThreadPoolExecutor(max_workers=BATCH_MAX_CONCURRENCY,
+                                                 thread_name_prefix='forecast-batch')
+        self.upload_processes = UPLOAD_PROCESSES if upload_processes is None else upload_processes
+        self._process_pool = None
+        self._process_pool_pid = None
+        self._process_pool_lock = threading.Lock()
     
     def analyze_history(self, historical_data):
         """
@@ -239,33 +510,144 @@ class ForecastEngine:
         
         return result
     
-    def generate_forecast(self, query, days=7, use_api_forecast=True):
+    def iter_batch(self, queries, days=7):
+        """
+        Generate forecasts for many locations, yielding each as it completes.
+        
+        Queries that share a location key (see location_key) are generated
+        once, and at most BATCH_MAX_CONCURRENCY forecasts run at a time. Pending work
+        is cancelled if the consumer stops iterating early.
+        
+        Args:
+            queries: List of location query strings
+            days: Number of days to forecast (1-10)
+            
+        Yields:
+            tuple: (indices into queries sharing the location, forecast dict;
+                    {'error': ...} if that location failed)
+        """
+        groups = {}
+        for index, query in enumerate(queries):
+            groups.setdefault(self.fetcher.location_key(query), []).append(index)
+        
+        futures = {
+            self.batch_executor.submit(self.generate_forecast, queries[indices[0]], days): indices
+            for indices in groups.values()
+        }
+        try:
+            for future in as_completed(futures):
+                try:
+                    forecast = future.result()
+                except Exception as e:
+                    forecast = {'error': str(e)}
+                yield futures[future], forecast
+        finally:
+            for future in futures:
+                future.cancel()
+    
+    def generate_forecast(self, query, days=7, use_api_forecast=True, progress=None):
         """
         Generate weather forecast combining API data and trend analysis.
         
+        Concurrent calls for the same location key and days share one
+        in-flight generation and all receive its result, which callers must
+        treat as read-only.
+        
         Args:
             query: Location query
             days: Number of days to forecast (1-10)
             use_api_forecast: Whether to use API forecast as base
+            progress: Optional callable(event, data) receiving the pipeline
+                      events of iter_forecast (leader call only)
             
         Returns:
             dict: Complete forecast result
         """
         days = min(max(days, 1), 10)
+        key = (self.fetcher.location_key(query), days, use_api_forecast)
+        return self.inflight.do(key, self._generate_forecast, query, days,
+                                use_api_forecast, progress)
+    
+    def _generate_forecast(self, query, days, use_api_forecast, progress=None):
+        """Drain the forecast pipeline, reporting progress events."""
+        for event, data in self.iter_forecast(query, days, use_api_forecast):
+            if event == 'result':
+                return data
+            if progress:
+                progress(event, data)
+    
+    def iter_forecast(self, query, days=7, use_api_forecast=True):
+        """
+        Run the forecast pipeline as a generator of (event, data) pairs.
+        
+        Upstream calls are fanned out together and an event is yielded as
+        each completes: 'current', 'forecast', one 'history' per past day
+        (cached days first) and then 'analysis'. The last pair is
+        ('result', forecast dict). Closing the generator early cancels the
+        calls that have not started yet.
         
-        # Fetch current weather
-        current_data = self.fetcher.get_current(query)
-        if not current_data:
-            return {'error': 'Failed to fetch current weather data'}
+        When a fresh stored forecast close enough to the query's position
+        exists, the only events are 'nearby' and its 'result'.
         
-        # Fetch API forecast
-        api_forecast = None
+        Args:
+            query: Location query
+            days: Number of days to forecast (1-10)
+            use_api_forecast: Whether to use API forecast as base
+            
+        Yields:
+            tuple: (event name, event data dict)
+        """
+        days = min(max(days, 1), 10)
+        
+        if use_api_forecast:
+            nearby = self.find_nearby_result(query, days)
+            if nearby:
+                yield 'nearby', nearby['nearby']
+                yield 'result', nearby
+                return
+        
+        # Fan out current, forecast and history calls together
+        current_future = self.fetcher.submit(self.fetcher.get_current, query)
+        forecast_future = None
         if use_api_forecast:
-            api_forecast = self.fetcher.get_forecast(query, days)
+            forecast_future = self.fetcher.submit(self.fetcher.get_forecast, query, days)
+        pending_history = self.fetcher.submit_history_range(query, days_back=7)
+        
+        futures = {current_future: 'current'}
+        if forecast_future:
+            futures[forecast_future] = 'forecast'
+        for date, data in pending_history:
+            if isinstance(data, Future):
+                futures[data] = date
+            else:
+                yield 'history', {'date': date, 'cached': True, 'total': len(pending_history)}
         
-        # Fetch historical data for trend analysis
-        historical_data = self.fetcher.get_history_range(query, days_back=7)
+        try:
+            for future in as_completed(futures):
+                kind = futures[future]
+                if kind == 'current':
+                    current_data = future.result()
+                    if not current_data:
+                        yield 'result', {'error': 'Failed to fetch current weather data'}
+                        return
+                    yield 'current', {'location': current_data.get('location', {}).get('name')}
+                elif kind == 'forecast':
+                    yield 'forecast', {'available': future.result() is not None}
+                else:
+                    yield 'history', {'date': kind, 'cached': False,
+                                      'available': future.result() is not None,
+                                      'total': len(pending_history)}
+        finally:
+            for future in futures:
+                future.cancel()
+        
+        current_data = current_future.result()
+        api_forecast = forecast_future.result() if forecast_future else None
+        
+        # Analyze historical data for trends
+        historical_data = self.fetcher.collect_history(pending_history)
         analysis = self.analyze_history(historical_data)
+        yield 'analysis', {'history_days': len(historical_data)}
         
         # Build forecast result
         location = current_data.get('location', {})
@@ -293,7 +675,8 @@ class ForecastEngine:
                 'air_quality': current.get('air_quality', {})
             },
             'analysis': analysis,
-            'forecast_days': []
+            'forecast_days': [],
+            'generated_at': datetime.now(timezone.utc).isoformat()
         }
         
         # Process API forecast data
@@ -330,7 +713,54 @@ class ForecastEngine:
                 }
                 result['forecast_days'].append(forecast_day)
         
-        return result
+        yield 'result', result
+    
+    def find_nearby_result(self, query, days):
+        """
+        Find a fresh stored forecast close to where a query points.
+        
+        Only queries with a known position qualify (coordinates, or names
+        resolved before). Age is taken from the forecast's own generated_at,
+        so a reused copy saved again does not extend its lifetime.
+        
+        Args:
+            query: Location query
+            days: Number of forecast days required
+            
+        Returns:
+            dict: Copy of the stored forecast trimmed to days, with a
+                  'nearby' entry naming the source result, or None
+        """
+        if NEARBY_RADIUS_KM <= 0 or NEARBY_MAX_AGE <= 0:
+            return None
+        position = self.fetcher.location_position(query)
+        if position is None:
+            return None
+        
+        try:
+            candidates = ForecastResult.find_nearby(*position, NEARBY_RADIUS_KM, NEARBY_MAX_AGE,
+                                                    min_days=days)
+        except Exception as e:
+            print(f"Error finding nearby forecasts: {e}")
+            return None
+        
+        oldest = datetime.now(timezone.utc) - timedelta(seconds=NEARBY_MAX_AGE)
+        for distance, stored in candidates:
+            data = stored.get_forecast_data()
+            if not isinstance(data, dict) or 'error' in data:
+                continue
+            try:
+                generated_at = datetime.fromisoformat(data['generated_at'])
+            except (KeyError, TypeError, ValueError):
+                continue
+            if generated_at < oldest or len(data.get('forecast_days') or ()) < days:
+                continue
+            
+            result = dict(data)
+            result['forecast_days'] = data['forecast_days'][:days]
+            result['nearby'] = {'result_id': stored.id, 'distance_km': round(distance, 3)}
+            return result
+        return None
     
     def process_json_upload(self, json_data):
         """
@@ -358,29 +788,108 @@ class ForecastEngine:
         except Exception as e:
             return {'error': f'Error processing JSON: {str(e)}'}
     
+    def process_json_stream(self, stream):
+        """
+        Process an uploaded JSON file without loading it into memory.
+        
+        Accepts a JSON array of readings, newline-delimited readings, or a
+        single weather object, and aggregates readings as they are parsed.
+        
+        Args:
+            stream: Binary file-like object with the uploaded content
+            
+        Returns:
+            dict: Processed forecast result, or {'error': ...}
+        """
+        try:
+            is_array, records = ingest.open_records(stream)
+            if is_array:
+                return self._process_weather_list(records)
+            
+            missing = object()
+            first = next(records)
+            second = next(records, missing)
+            if second is missing:
+                return self.process_json_upload(first)
+            return self._process_weather_list(chain((first, second), records))
+        except ValueError as e:
+            return {'error': f'Invalid JSON format: {str(e)}'}
+        except Exception as e:
+            return {'error': f'Error processing JSON: {str(e)}'}
+    
     def _process_weather_list(self, weather_list):
-        """Process a list of weather readings."""
-        if not weather_list:
-            return {'error': 'Empty weather data list'}
+        """
+        Process weather readings in a single pass with running aggregates.
         
-        temps = []
-        humidities = []
+        Args:
+            weather_list: Iterable of reading dicts (a list or a stream)
+            
+        Returns:
+            dict: Aggregated analysis of the readings
+        """
+        if self.upload_processes > 0:
+            return self._summarize_readings(self._reduce_in_processes(weather_list))
+        return self._summarize_readings(ReadingStats().update(weather_list))
+    
+    def _reduce_in_processes(self, weather_list):
+        """
+        Reduce readings to ReadingStats using the process pool.
         
-        for reading in weather_list:
-            if 'temperature' in reading:
-                temps.append(reading['temperature'])
-            if 'temp' in reading:
-                temps.append(reading['temp'])
-            if 'humidity' in reading:
-                humidities.append(reading['humidity'])
+        Up to UPLOAD_PARALLEL_THRESHOLD readings are buffered first; smaller
+        inputs are reduced in-process, since shipping them to workers would
+        cost more than it saves. Larger inputs are split into chunks of
+        UPLOAD_CHUNK_READINGS whose partial states are merged in input order,
+        with a bounded number of chunks in flight.
+        """
+        readings = iter(weather_list)
+        head = list(islice(readings, UPLOAD_PARALLEL_THRESHOLD))
+        if len(head) < UPLOAD_PARALLEL_THRESHOLD:
+            return ReadingStats().update(head)
+        
+        pool = self._get_process_pool()
+        stats = ReadingStats()
+        pending = deque()
+        try:
+            for chunk in _chunked(chain(head, readings), UPLOAD_CHUNK_READINGS):
+                pending.append(pool.submit(summarize_readings, chunk))
+                while len(pending) > 2 * self.upload_processes:
+                    stats.merge(pending.popleft().result())
+            while pending:
+                stats.merge(pending.popleft().result())
+        finally:
+            for future in pending:
+                future.cancel()
+        return stats
+    
+    def _get_process_pool(self):
+        """Return this process's upload worker pool, creating it on first use."""
+        with self._process_pool_lock:
+            if self._process_pool is None or self._process_pool_pid != os.getpid():
+                # spawn, not fork: the web process runs threads
+                self._process_pool = ProcessPoolExecutor(
+                    max_workers=self.upload_processes,
+                    mp_context=multiprocessing.get_context('spawn')
+                )
+                self._process_pool_pid = os.getpid()
+            return self._process_pool
+    
+    def _summarize_readings(self, stats):
+        """Build the upload analysis result from accumulated ReadingStats."""
+        if not stats.data_points:
+            return {'error': 'Empty weather data list'}
         
+        temperature, humidity = stats.temperature, stats.humidity
         return {
             'source': 'uploaded_json',
             'analysis': {
-                'avg_temperature': sum(temps) / len(temps) if temps else 0,
-                'avg_humidity': sum(humidities) / len(humidities) if humidities else 0,
-                'temp_trend': self._calculate_trend(temps),
-                'data_points': len(weather_list)
+                'avg_temperature': temperature.mean if temperature.count else 0,
+                'avg_humidity': humidity.mean if humidity.count else 0,
+                'temp_trend': temperature.slope,
+                'humidity_trend': humidity.slope,
+                'min_temperature': temperature.min,
+                'max_temperature': temperature.max,
+                'temp_stdev': temperature.stdev,
+                'data_points': stats.data_points
             }
         }
     
@@ -396,6 +905,36 @@ class ForecastEngine:
         }
 
 
+def _chunked(iterable, size):
+    """Yield successive lists of up to size items."""
+    iterator = iter(iterable)
+    while True:
+        chunk = list(islice(iterator, size))
+        if not chunk:
+            return
+        yield chunk
+
+
+# One anchored alternation tried in priority order; the name of the group
+# that matched is the query type. Postal codes match case-insensitively.
+QUERY_TYPE_PATTERN = re.compile(r"""
+    ^(?:
+        (?P<ip>(?:\d{1,3}\.){3}\d{1,3})
+      | (?P<coordinates>(?P<lat>-?\d+\.?\d*)\s*,\s*(?P<lon>-?\d+\.?\d*))
+      | (?P<postal_us>\d{5}(?:-\d{4})?)
+      | (?P<postal_uk>(?i:[A-Z]{1,2}\d[A-Z\d]?\s*\d[A-Z]{2}))
+      | (?P<postal_ca>(?i:[A-Z]\d[A-Z]\s*\d[A-Z]\d))
+    )$
+""", re.VERBOSE)
+
+
+@lru_cache(maxsize=QUERY_CACHE_SIZE)
+def _classify(query):
+    """Return (query type, match or None) for a stripped query."""
+    match = QUERY_TYPE_PATTERN.match(query)
+    return (match.lastgroup, match) if match else ('city', None)
+
+
 def detect_query_type(query):
     """
     Detect the type of location query.
@@ -406,34 +945,34 @@ def detect_query_type(query):
     Returns:
         str: Query type (city, coordinates, ip, postal_us, postal_uk, postal_ca)
     """
-    import re
-    
-    query = query.strip()
-    
-    # IP address pattern
-    ip_pattern = r'^(\d{1,3}\.){3}\d{1,3}$'
-    if re.match(ip_pattern, query):
-        return 'ip'
-    
-    # Coordinates pattern (lat,lon)
-    coord_pattern = r'^-?\d+\.?\d*\s*,\s*-?\d+\.?\d*$'
-    if re.match(coord_pattern, query):
-        return 'coordinates'
+    return _classify(query.strip())[0]
+
+
+@lru_cache(maxsize=QUERY_CACHE_SIZE)
+def normalize_query(query):
+    """
+    Normalize a location query into a stable cache key.
     
-    # US postal code (5 digits or 5+4)
-    us_postal = r'^\d{5}(-\d{4})?$'
-    if re.match(us_postal, query):
-        return 'postal_us'
+    Whitespace is collapsed, text queries are case-folded, postal codes
+    lose their spaces and coordinates are rounded to COORDINATE_PRECISION
+    decimal places, so equivalent spellings of the same location share
+    cache entries.
     
-    # UK postal code
-    uk_postal = r'^[A-Z]{1,2}\d[A-Z\d]?\s*\d[A-Z]{2}$'
-    if re.match(uk_postal, query, re.IGNORECASE):
-        return 'postal_uk'
+    Args:
+        query: Location query string
+        
+    Returns:
+        str: Cache key of the form "<query_type>:<normalized query>"
+    """
+    query_type, match = _classify(query.strip())
     
-    # Canadian postal code
-    ca_postal = r'^[A-Z]\d[A-Z]\s*\d[A-Z]\d$'
-    if re.match(ca_postal, query, re.IGNORECASE):
-        return 'postal_ca'
+    if query_type == 'coordinates':
+        lat, lon = (round(float(match.group(name)), COORDINATE_PRECISION) + 0.0
+                    for name in ('lat', 'lon'))
+        normalized = f"{lat:.{COORDINATE_PRECISION}f},{lon:.{COORDINATE_PRECISION}f}"
+    elif query_type in ('postal_uk', 'postal_ca'):
+        normalized = ''.join(query.split()).casefold()
+    else:
+        normalized = ' '.join(query.split()).casefold()
     
-    # Default to city name
-    return 'city'
+    return f"{query_type}:{normalized}"
@@ -0,0 +1,62 @@
+"""
+Galaxy Weather - Location Geometry
+Geohash grid snapping and distances used to canonicalize locations, so
+nearby coordinates and named places share cache entries.
+"""
+
+import math
+import os
+
+# Geohash length of a location grid cell (6 ~ 1.2 x 0.6 km); 0 disables the grid
+LOCATION_GEOHASH_PRECISION = int(os.getenv('LOCATION_GEOHASH_PRECISION', 6))
+GEOHASH_ALPHABET = '0123456789bcdefghjkmnpqrstuvwxyz'
+EARTH_RADIUS_KM = 6371.0088
+
+
+def geohash(lat, lon, precision=None):
+    """
+    Encode a coordinate as a geohash of the given length.
+
+    Args:
+        lat: Latitude in degrees
+        lon: Longitude in degrees
+        precision: Number of characters (defaults to LOCATION_GEOHASH_PRECISION)
+
+    Returns:
+        str: Geohash of the cell containing the point
+    """
+    precision = precision or LOCATION_GEOHASH_PRECISION
+    lat_range, lon_range = [-90.0, 90.0], [-180.0, 180.0]
+    chars = []
+    bits = value = 0
+    even = True
+    while len(chars) < precision:
+        # Bits alternate between longitude and latitude, longitude first
+        interval, coordinate = (lon_range, lon) if even else (lat_range, lat)
+        mid = (interval[0] + interval[1]) / 2
+        value <<= 1
+        if coordinate >= mid:
+            value |= 1
+            interval[0] = mid
+        else:
+            interval[1] = mid
+        even = not even
+        bits += 1
+        if bits == 5:
+            chars.append(GEOHASH_ALPHABET[value])
+            bits = value = 0
+    return ''.join(chars)
+
+
+def location_key(lat, lon, precision=None):
+    """Return the canonical cache key of the grid cell containing a point."""
+    return f"geo:{geohash(lat, lon, precision)}"
+
+
+def haversine_km(lat1, lon1, lat2, lon2):
+    """Great-circle distance between two points in kilometres."""
+    phi1, phi2 = math.radians(lat1), math.radians(lat2)
+    dphi = phi2 - phi1
+    dlambda = math.radians(lon2 - lon1)
+    a = math.sin(dphi / 2) ** 2 + math.cos(phi1) * math.cos(phi2) * math.sin(dlambda / 2) ** 2
+    return 2 * EARTH_RADIUS_KM * math.asin(min(1.0, math.sqrt(a)))
@@ -0,0 +1,139 @@
+"""
+Galaxy Weather - Upload Ingestion
+Incremental parsing of uploaded weather readings, so large sensor dumps are
+processed record by record instead of being loaded into memory whole.
+"""
+
+import codecs
+import json
+import os
+
+# Bytes read from the upload per step; grows while a single value is incomplete
+UPLOAD_CHUNK_SIZE = int(os.getenv('UPLOAD_CHUNK_SIZE', 64 * 1024))
+# Largest single record accepted; bounds the buffer however the input is shaped
+MAX_RECORD_BYTES = int(os.getenv('UPLOAD_MAX_RECORD_BYTES', 16 * 1024 * 1024))
+WHITESPACE = ' \t\n\r'
+# A value cut off by the end of the buffer fails within this many characters
+# of the end (the longest partial token, e.g. "-Infinit" or a \uXXXX escape)
+TRUNCATION_SLACK = 16
+
+
+class _Reader:
+    """Text buffer over a binary stream that decodes one JSON value at a time."""
+
+    def __init__(self, stream, chunk_size, max_record=None):
+        self.stream = stream
+        self.chunk_size = chunk_size
+        self.max_record = max_record or MAX_RECORD_BYTES
+        self.decoder = json.JSONDecoder()
+        self.text = codecs.getincrementaldecoder('utf-8-sig')()
+        self.buf = ''
+        self.pos = 0
+        self.eof = False
+
+    def fill(self, size):
+        """Append up to size more bytes of input; return False at end of input."""
+        if self.eof:
+            return False
+        if self.pos:
+            self.buf = self.buf[self.pos:]
+            self.pos = 0
+        data = self.stream.read(size)
+        self.eof = not data
+        self.buf += self.text.decode(data or b'', final=self.eof)
+        return True
+
+    def peek(self):
+        """Skip whitespace and return the next character, or None at the end."""
+        while True:
+            while self.pos < len(self.buf) and self.buf[self.pos] in WHITESPACE:
+                self.pos += 1
+            if self.pos < len(self.buf):
+                return self.buf[self.pos]
+            if not self.fill(self.chunk_size):
+                return None
+
+    def expect(self, char):
+        if self.peek() != char:
+            raise ValueError(f"Expected '{char}' at offset {self.pos} of the buffered input")
+        self.pos += 1
+
+    def value(self):
+        """
+        Decode the next JSON value.
+
+        A value cut off by the end of the buffer, or ending exactly there (a
+        number may continue in the next chunk), is retried with more input;
+        the read size doubles each time so one huge value is still parsed in
+        linear time. Errors inside the buffered input are raised at once,
+        and values longer than max_record are rejected.
+        """
+        size = self.chunk_size
+        while True:
+            self.peek()
+            try:
+                value, end = self.decoder.raw_decode(self.buf, self.pos)
+            except json.JSONDecodeError as e:
+                if not self._truncated(e) or self.eof:
+                    raise
+            else:
+                if end < len(self.buf) or self.eof:
+                    self.pos = end
+                    return value
+            if len(self.buf) - self.pos > self.max_record:
+                raise ValueError(f'Record larger than {self.max_record} bytes')
+            self.fill(size)
+            size = min(size * 2, self.max_record)
+
+    def _truncated(self, error):
+        """Check whether a decode error may just be the end of the buffer."""
+        return (error.pos >= len(self.buf) - TRUNCATION_SLACK
+                or error.msg.startswith('Unterminated string'))
+
+    def iter_array(self):
+        self.expect('[')
+        if self.peek() == ']':
+            self.pos += 1
+        else:
+            while True:
+                yield self.value()
+                if self.peek() == ',':
+                    self.pos += 1
+                    continue
+                self.expect(']')
+                break
+        if self.peek() is not None:
+            raise ValueError('Unexpected data after the JSON array')
+
+    def iter_values(self):
+        while self.peek() is not None:
+            yield self.value()
+
+
+def open_records(stream, chunk_size=None):
+    """
+    Start reading weather records from an uploaded file.
+
+    A top-level JSON array yields its elements one at a time; anything else
+    (a single JSON document, or newline-delimited JSON) yields each
+    top-level value. Only the value being decoded is held in memory.
+
+    Args:
+        stream: Binary file-like object with read(size), UTF-8 encoded
+        chunk_size: Bytes to read per step (defaults to UPLOAD_CHUNK_SIZE)
+
+    Returns:
+        tuple: (is_array, iterator of decoded values)
+
+    Raises:
+        ValueError: If the upload is empty; malformed JSON raises
+                    json.JSONDecodeError (a ValueError), and a record over
+                    MAX_RECORD_BYTES a ValueError, while iterating
+    """
+    reader = _Reader(stream, chunk_size or UPLOAD_CHUNK_SIZE)
+    first = reader.peek()
+    if first is None:
+        raise ValueError('Uploaded file is empty')
+    if first == '[':
+        return True, reader.iter_array()
+    return False, reader.iter_values()
@@ -0,0 +1,204 @@
+"""
+Galaxy Weather - Background Jobs
+Thread-based worker pool that processes queued forecast requests from the
+SQLite forecast_job table, so web workers never wait on WeatherAPI.
+"""
+
+import os
+import threading
+import time
+import traceback
+
+from models import ForecastJob, ForecastProgress
+
+# Forecasts processed concurrently per process, independent of web workers
+FORECAST_WORKERS = int(os.getenv('FORECAST_WORKERS', 4))
+JOB_POLL_INTERVAL = float(os.getenv('JOB_POLL_INTERVAL', 1.0))
+# Jobs running longer than this are assumed orphaned and re-queued
+JOB_STALE_SECONDS = int(os.getenv('JOB_STALE_SECONDS', 300))
+# Claims after which an orphaned job is failed instead of re-queued
+JOB_MAX_ATTEMPTS = int(os.getenv('JOB_MAX_ATTEMPTS', 3))
+# Seconds between stale job sweeps, shared by the workers of a process
+JOB_SWEEP_INTERVAL = float(os.getenv('JOB_SWEEP_INTERVAL', 60))
+# Seconds progress events of a finished job stay available to late subscribers
+PROGRESS_RETENTION = int(os.getenv('PROGRESS_RETENTION', 300))
+# Seconds between checks for progress events published by other processes
+PROGRESS_POLL_INTERVAL = float(os.getenv('PROGRESS_POLL_INTERVAL', 0.5))
+TERMINAL_EVENTS = ('done', 'error')
+
+
+class ProgressBroker:
+    """
+    Log of progress events per request, shared through the database.
+
+    Workers publish events as the pipeline advances; readers block until
+    events newer than the last one they saw arrive. The log lives in the
+    forecast_progress table, so a reader in any process sees the events of
+    a job run by another: events published in this process wake readers at
+    once, others are picked up every PROGRESS_POLL_INTERVAL seconds. Events
+    are kept until PROGRESS_RETENTION seconds after the job finished, so
+    subscribers that connect late or reconnect replay what they missed.
+    """
+
+    def __init__(self, retention=None, poll_interval=None):
+        self.retention = PROGRESS_RETENTION if retention is None else retention
+        self.poll_interval = PROGRESS_POLL_INTERVAL if poll_interval is None else poll_interval
+        self._cond = threading.Condition()
+        self._version = 0
+
+    def publish(self, request_id, event, data=None):
+        """Append an event to a request's log and wake its readers."""
+        try:
+            ForecastProgress.append(request_id, event, data)
+            if event in TERMINAL_EVENTS:
+                ForecastProgress.purge_finished(self.retention)
+        except Exception as e:
+            # Progress is informational; never fail the job over it
+            print(f"Error publishing progress for request {request_id}: {e}")
+            return
+        with self._cond:
+            self._version += 1
+            self._cond.notify_all()
+
+    def wait(self, request_id, after=0, timeout=15):
+        """
+        Return events with a sequence number above after.
+
+        Blocks up to timeout seconds when none are available yet.
+
+        Returns:
+            list: (sequence, event, data) tuples, possibly empty
+        """
+        deadline = time.time() + timeout
+        while True:
+            version = self._version
+            events = ForecastProgress.since(request_id, after)
+            remaining = deadline - time.time()
+            if events or remaining <= 0:
+                return events
+            with self._cond:
+                if self._version == version:
+                    self._cond.wait(min(remaining, self.poll_interval))
+
+
+class JobQueue:
+    """
+    Worker pool backed by the forecast_job table.
+
+    Workers start on start() (the app calls it at bootstrap) or the first
+    enqueue, and again in a forked child, so importing the app does not
+    spawn threads and forked processes get their own workers.
+    Jobs are claimed atomically, so several processes can share one table.
+    """
+
+    def __init__(self, handler, workers=None, poll_interval=None):
+        """
+        Args:
+            handler: Callable(request_id, payload, progress) returning an
+                     error message string on failure, or None on success;
+                     progress is a callable(event, data) for status events
+            workers: Number of worker threads
+            poll_interval: Seconds between polls when idle
+        """
+        self.handler = handler
+        self.workers = FORECAST_WORKERS if workers is None else workers
+        self.poll_interval = JOB_POLL_INTERVAL if poll_interval is None else poll_interval
+        self.progress = ProgressBroker()
+        self._wakeup = threading.Event()
+        self._stopping = threading.Event()
+        self._lock = threading.Lock()
+        self._threads = []
+        self._pid = None
+        self._next_sweep = 0
+
+    def start(self):
+        """Start the worker threads once per process."""
+        if self._pid == os.getpid():
+            return
+        with self._lock:
+            if self._pid == os.getpid():
+                return
+            self._pid = os.getpid()
+            self._next_sweep = 0
+            self._threads = [
+                threading.Thread(target=self._run, name=f'forecast-worker-{i}', daemon=True)
+                for i in range(self.workers)
+            ]
+            for thread in self._threads:
+                thread.start()
+
+    def stop(self, timeout=None):
+        """Stop this process's workers once they finish their current job."""
+        with self._lock:
+            threads, self._threads = self._threads, []
+            self._stopping.set()
+            self._wakeup.set()
+            for thread in threads:
+                thread.join(timeout)
+            self._stopping = threading.Event()
+            self._pid = None
+
+    def enqueue(self, request_id, payload=None):
+        """
+        Queue a request and wake an idle worker.
+
+        Returns:
+            bool: True if a new job was queued
+        """
+        queued = ForecastJob.enqueue(request_id, payload)
+        self.start()
+        self._wakeup.set()
+        return queued
+
+    def sweep(self):
+        """
+        Recover jobs orphaned by dead workers, at most once per sweep interval.
+
+        Returns:
+            bool: True if a sweep ran
+        """
+        with self._lock:
+            now = time.time()
+            if now < self._next_sweep:
+                return False
+            self._next_sweep = now + JOB_SWEEP_INTERVAL
+        requeued, failed = ForecastJob.requeue_stale(JOB_STALE_SECONDS, JOB_MAX_ATTEMPTS)
+        if requeued or failed:
+            print(f"Recovered stale forecast jobs: {requeued} re-queued, {failed} failed")
+        return True
+
+    def _run(self):
+        """Worker loop: claim and process jobs, sleeping when idle."""
+        stopping = self._stopping
+        while not stopping.is_set():
+            try:
+                self.sweep()
+                job = ForecastJob.claim_next()
+            except Exception:
+                traceback.print_exc()
+                job = None
+
+            if job is None:
+                self._wakeup.wait(self.poll_interval)
+                self._wakeup.clear()
+                continue
+
+            self.process(job)
+
+    def process(self, job):
+        """Run the handler for one claimed job and record the outcome."""
+        def report(event, data=None):
+            self.progress.publish(job.request_id, event, data)
+
+        report('started', {'attempt': job.attempts})
+        try:
+            error = self.handler(job.request_id, job.payload, report)
+        except Exception as e:
+            traceback.print_exc()
+            error = str(e)
+        job.finish(error)
+
+        if error:
+            report('error', {'error': error})
+        else:
+            report('done')
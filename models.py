@@ -5,77 +5,445 @@ SQLite database models for storing weather forecast requests and results.
 
 import sqlite3
 from datetime import datetime
+import base64
 import json
+import math
 import os
+import threading
+import time
+from contextlib import contextmanager
+from itertools import count
+
+import codec
+import geo
 
 DATABASE_PATH = os.path.join(os.path.dirname(__file__), 'database.db')
 
+# Connection tuning: WAL lets readers run alongside a writer, NORMAL
+# synchronous is durable in WAL mode, cache_size is in KiB when negative
+DB_BUSY_TIMEOUT = float(os.getenv('DB_BUSY_TIMEOUT', 5.0))
+DB_CACHE_SIZE_KB = int(os.getenv('DB_CACHE_SIZE_KB', 16384))
+DB_STATEMENT_CACHE = int(os.getenv('DB_STATEMENT_CACHE', 256))
+DB_PRAGMAS = (
+    'PRAGMA journal_mode = WAL',
+    'PRAGMA synchronous = NORMAL',
+    f'PRAGMA cache_size = -{DB_CACHE_SIZE_KB}',
+    'PRAGMA temp_store = MEMORY',
+)
+# Expired response cache rows are deleted on every Nth write (0 disables)
+RESPONSE_CACHE_PURGE_EVERY = int(os.getenv('RESPONSE_CACHE_PURGE_EVERY', 200))
 
-def get_db_connection():
-    """Create and return a database connection."""
-    conn = sqlite3.connect(DATABASE_PATH)
+_local = threading.local()
+
+
+def _connect(path):
+    """Open and tune a new database connection."""
+    conn = sqlite3.connect(path, timeout=DB_BUSY_TIMEOUT,
+                           cached_statements=DB_STATEMENT_CACHE)
     conn.row_factory = sqlite3.Row
+    for pragma in DB_PRAGMAS:
+        conn.execute(pragma)
     return conn
 
 
-def init_db():
-    """Initialize the database with required tables."""
+def get_db_connection():
+    """
+    Return this thread's persistent database connection.
+    
+    Connections are opened once per thread (and per process, so forked
+    workers never share one) and reused, which keeps the prepared
+    statement cache warm. Wrap writes in transaction(); do not close it.
+    """
+    key = (os.getpid(), DATABASE_PATH)
+    conn = getattr(_local, 'conn', None)
+    if conn is None or _local.key != key:
+        conn = _local.conn = _connect(DATABASE_PATH)
+        _local.key = key
+    return conn
+
+
+@contextmanager
+def transaction(immediate=False):
+    """
+    Unit of work on this thread's connection.
+    
+    The outermost block commits once on success (a single fsync for all
+    grouped writes) or rolls everything back on error. Nested blocks run
+    as savepoints, so a failing inner block only undoes its own writes.
+    
+    Args:
+        immediate: Take the write lock up front (BEGIN IMMEDIATE), for
+                   read-then-write sequences that must not interleave
+    
+    Yields:
+        sqlite3.Connection: The thread's connection
+    """
     conn = get_db_connection()
-    cursor = conn.cursor()
-    
-    # Weather Request Table
-    cursor.execute('''
-        CREATE TABLE IF NOT EXISTS weather_request (
-            id INTEGER PRIMARY KEY AUTOINCREMENT,
-            query TEXT NOT NULL,
-            query_type TEXT NOT NULL,
-            range_days INTEGER NOT NULL,
-            created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
-            status TEXT DEFAULT 'created'
-        )
-    ''')
+    depth = getattr(_local, 'tx_depth', 0)
+    savepoint = f'sp_{depth}'
+    conn.execute(('BEGIN IMMEDIATE' if immediate else 'BEGIN') if depth == 0
+                 else f'SAVEPOINT {savepoint}')
+    _local.tx_depth = depth + 1
+    try:
+        yield conn
+    except BaseException:
+        if depth == 0:
+            conn.rollback()
+        else:
+            conn.execute(f'ROLLBACK TO {savepoint}')
+            conn.execute(f'RELEASE {savepoint}')
+        raise
+    else:
+        if depth == 0:
+            conn.commit()
+        else:
+            conn.execute(f'RELEASE {savepoint}')
+    finally:
+        _local.tx_depth = depth
+
+
+def close_db_connection():
+    """Close this thread's connection, e.g. when a worker thread exits."""
+    conn = getattr(_local, 'conn', None)
+    if conn is not None:
+        _local.conn = None
+        conn.close()
+
+
+def encode_forecast_data(value):
+    """Encode forecast data for the forecast_result.forecast_data column."""
+    if value is None or codec.is_encoded(value):
+        return value
+    if isinstance(value, str):
+        value = json.loads(value)
+    return sqlite3.Binary(codec.encode(value))
+
+
+def _compress_forecast_rows(conn, batch_size=500):
+    """Data migration: rewrite legacy JSON text rows as encoded blobs."""
+    last_id = 0
+    while True:
+        rows = conn.execute('''
+            SELECT id, forecast_data FROM forecast_result
+            WHERE id > ? AND typeof(forecast_data) = 'text'
+            ORDER BY id LIMIT ?
+        ''', (last_id, batch_size)).fetchall()
+        if not rows:
+            return
+        updates = []
+        for row in rows:
+            try:
+                updates.append((encode_forecast_data(row['forecast_data']), row['id']))
+            except ValueError:
+                continue  # leave unparseable rows as they are
+        conn.executemany('UPDATE forecast_result SET forecast_data = ? WHERE id = ?', updates)
+        last_id = rows[-1]['id']
+
+
+SPATIAL_INDEX_TABLE = 'forecast_result_rtree'
+_spatial_index = {}
+
+
+def _create_spatial_index(conn):
+    """
+    Migration: index result positions in an R*Tree, kept current by triggers.
     
-    # Forecast Result Table
-    cursor.execute('''
-        CREATE TABLE IF NOT EXISTS forecast_result (
-            id INTEGER PRIMARY KEY AUTOINCREMENT,
-            request_id INTEGER NOT NULL,
-            location_name TEXT,
-            country TEXT,
-            latitude REAL,
-            longitude REAL,
-            forecast_data TEXT,
-            current_temp REAL,
-            current_humidity REAL,
-            current_condition TEXT,
-            created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
-            FOREIGN KEY (request_id) REFERENCES weather_request (id)
-        )
-    ''')
+    SQLite builds without the R*Tree module get a (latitude, longitude)
+    index instead, which find_nearby() uses for a bounding-box scan.
+    """
+    try:
+        conn.execute(f'''
+            CREATE VIRTUAL TABLE IF NOT EXISTS {SPATIAL_INDEX_TABLE}
+            USING rtree(id, min_lat, max_lat, min_lon, max_lon)
+        ''')
+    except sqlite3.OperationalError:
+        conn.execute('CREATE INDEX IF NOT EXISTS idx_forecast_result_position '
+                     'ON forecast_result (latitude, longitude)')
+        return
     
-    # Historical Data Cache Table
-    cursor.execute('''
-        CREATE TABLE IF NOT EXISTS historical_cache (
-            id INTEGER PRIMARY KEY AUTOINCREMENT,
-            location_query TEXT NOT NULL,
-            date TEXT NOT NULL,
-            avg_temp REAL,
-            max_temp REAL,
-            min_temp REAL,
-            humidity REAL,
-            condition TEXT,
-            cached_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
-            UNIQUE(location_query, date)
-        )
+    conn.execute(f'''
+        INSERT OR REPLACE INTO {SPATIAL_INDEX_TABLE}
+        SELECT id, latitude, latitude, longitude, longitude FROM forecast_result
+        WHERE latitude IS NOT NULL AND longitude IS NOT NULL
+    ''')
+    conn.execute(f'''
+        CREATE TRIGGER IF NOT EXISTS forecast_result_position_insert
+        AFTER INSERT ON forecast_result
+        WHEN NEW.latitude IS NOT NULL AND NEW.longitude IS NOT NULL
+        BEGIN
+            INSERT OR REPLACE INTO {SPATIAL_INDEX_TABLE}
+            VALUES (NEW.id, NEW.latitude, NEW.latitude, NEW.longitude, NEW.longitude);
+        END
     ''')
+    conn.execute(f'''
+        CREATE TRIGGER IF NOT EXISTS forecast_result_position_update
+        AFTER UPDATE OF latitude, longitude ON forecast_result
+        BEGIN
+            DELETE FROM {SPATIAL_INDEX_TABLE} WHERE id = OLD.id;
+            INSERT INTO {SPATIAL_INDEX_TABLE}
+            SELECT NEW.id, NEW.latitude, NEW.latitude, NEW.longitude, NEW.longitude
+            WHERE NEW.latitude IS NOT NULL AND NEW.longitude IS NOT NULL;
+        END
+    ''')
+    conn.execute(f'''
+        CREATE TRIGGER IF NOT EXISTS forecast_result_position_delete
+        AFTER DELETE ON forecast_result
+        BEGIN
+            DELETE FROM {SPATIAL_INDEX_TABLE} WHERE id = OLD.id;
+        END
+    ''')
+
+
+def has_spatial_index(conn=None):
+    """Check (once per database file) whether the R*Tree position index exists."""
+    if DATABASE_PATH not in _spatial_index:
+        conn = conn or get_db_connection()
+        _spatial_index[DATABASE_PATH] = conn.execute(
+            "SELECT 1 FROM sqlite_master WHERE type = 'table' AND name = ?",
+            (SPATIAL_INDEX_TABLE,)
+        ).fetchone() is not None
+    return _spatial_index[DATABASE_PATH]
+
+
+# Schema migrations: (version, description, steps). A step is either an SQL
+# statement or a callable taking the connection, for data migrations.
+# Append new migrations; never edit one that has shipped.
+SCHEMA_MIGRATIONS = [
+    (1, 'Initial tables', (
+        # Weather Request Table
+        '''
+            CREATE TABLE IF NOT EXISTS weather_request (
+                id INTEGER PRIMARY KEY AUTOINCREMENT,
+                query TEXT NOT NULL,
+                query_type TEXT NOT NULL,
+                range_days INTEGER NOT NULL,
+                created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+                status TEXT DEFAULT 'created'
+            )
+        ''',
+        # Forecast Result Table
+        '''
+            CREATE TABLE IF NOT EXISTS forecast_result (
+                id INTEGER PRIMARY KEY AUTOINCREMENT,
+                request_id INTEGER NOT NULL,
+                location_name TEXT,
+                country TEXT,
+                latitude REAL,
+                longitude REAL,
+                forecast_data TEXT,
+                current_temp REAL,
+                current_humidity REAL,
+                current_condition TEXT,
+                created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+                FOREIGN KEY (request_id) REFERENCES weather_request (id)
+            )
+        ''',
+        # Historical Data Cache Table
+        '''
+            CREATE TABLE IF NOT EXISTS historical_cache (
+                id INTEGER PRIMARY KEY AUTOINCREMENT,
+                location_query TEXT NOT NULL,
+                date TEXT NOT NULL,
+                avg_temp REAL,
+                max_temp REAL,
+                min_temp REAL,
+                humidity REAL,
+                condition TEXT,
+                cached_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+                UNIQUE(location_query, date)
+            )
+        ''',
+        # Background Forecast Job Table
+        '''
+            CREATE TABLE IF NOT EXISTS forecast_job (
+                id INTEGER PRIMARY KEY AUTOINCREMENT,
+                request_id INTEGER NOT NULL UNIQUE,
+                status TEXT DEFAULT 'queued',
+                payload TEXT,
+                error TEXT,
+                attempts INTEGER DEFAULT 0,
+                created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+                started_at TIMESTAMP,
+                finished_at TIMESTAMP,
+                FOREIGN KEY (request_id) REFERENCES weather_request (id)
+            )
+        ''',
+        # Upstream Response Cache Table
+        '''
+            CREATE TABLE IF NOT EXISTS response_cache (
+                cache_key TEXT PRIMARY KEY,
+                payload TEXT NOT NULL,
+                expires_at REAL NOT NULL
+            )
+        ''',
+    )),
+    (2, 'Indexes for result lookups, listings and job polling', (
+        'CREATE INDEX IF NOT EXISTS idx_forecast_result_request_id ON forecast_result (request_id)',
+        'CREATE INDEX IF NOT EXISTS idx_forecast_result_created_at ON forecast_result (created_at)',
+        'CREATE INDEX IF NOT EXISTS idx_weather_request_created_status ON weather_request (created_at, status)',
+        'CREATE INDEX IF NOT EXISTS idx_forecast_job_status ON forecast_job (status, id)',
+    )),
+    (3, 'Store forecast_data as compressed codec blobs', (
+        _compress_forecast_rows,
+    )),
+    (4, 'Keyset pagination index for requests (created_at, rowid)', (
+        'CREATE INDEX IF NOT EXISTS idx_weather_request_created_at ON weather_request (created_at)',
+    )),
+    (5, 'Location aliases: named queries resolved to grid cells', (
+        '''
+            CREATE TABLE IF NOT EXISTS location_alias (
+                query_key TEXT PRIMARY KEY,
+                location_key TEXT NOT NULL,
+                latitude REAL NOT NULL,
+                longitude REAL NOT NULL,
+                updated_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+            )
+        ''',
+    )),
+    (6, 'Spatial index over result positions for nearby lookups', (
+        _create_spatial_index,
+    )),
+    (7, 'Progress events of forecast jobs, shared by all processes', (
+        '''
+            CREATE TABLE IF NOT EXISTS forecast_progress (
+                request_id INTEGER NOT NULL,
+                seq INTEGER NOT NULL,
+                event TEXT NOT NULL,
+                data TEXT,
+                created_at REAL NOT NULL,
+                PRIMARY KEY (request_id, seq)
+            ) WITHOUT ROWID
+        ''',
+        'CREATE INDEX IF NOT EXISTS idx_forecast_progress_terminal '
+        'ON forecast_progress (created_at) WHERE event IN (\'done\', \'error\')',
+    )),
+]
+SCHEMA_VERSION = SCHEMA_MIGRATIONS[-1][0]
+
+
+def get_schema_version(conn=None):
+    """Return the schema version recorded in the database file."""
+    conn = conn or get_db_connection()
+    return conn.execute('PRAGMA user_version').fetchone()[0]
+
+
+def init_db():
+    """
+    Bring the database schema up to date by running pending migrations.
     
-    conn.commit()
-    conn.close()
+    The applied version is tracked in PRAGMA user_version, so existing
+    database files are upgraded in place. Each migration runs in its own
+    IMMEDIATE transaction, and the version is re-read inside it, so
+    processes that start together apply each migration only once.
+    
+    Returns:
+        int: Schema version after migrating
+    """
+    conn = get_db_connection()
+    if get_schema_version(conn) >= SCHEMA_VERSION:
+        return SCHEMA_VERSION
+    
+    for version, description, steps in SCHEMA_MIGRATIONS:
+        if get_schema_version(conn) >= version:
+            continue
+        
+        with transaction(immediate=True):
+            if get_schema_version(conn) < version:
+                for step in steps:
+                    if callable(step):
+                        step(conn)
+                    else:
+                        conn.execute(step)
+                conn.execute(f'PRAGMA user_version = {int(version)}')
+    
+    return get_schema_version(conn)
+
+
+def encode_cursor(created_at, row_id):
+    """Encode a keyset position (created_at, id) as an opaque URL-safe token."""
+    raw = json.dumps([str(created_at), row_id]).encode('utf-8')
+    return base64.urlsafe_b64encode(raw).decode('ascii').rstrip('=')
+
+
+def decode_cursor(token):
+    """
+    Decode a token from encode_cursor().
+    
+    Returns:
+        tuple: (created_at, id), or None for an empty or malformed token
+    """
+    if not token:
+        return None
+    try:
+        raw = base64.urlsafe_b64decode(token + '=' * (-len(token) % 4))
+        created_at, row_id = json.loads(raw)
+        return str(created_at), int(row_id)
+    except (ValueError, TypeError):
+        return None
+
+
+_ROW_MAPPERS = {}
+
+
+def row_mapper(cls, columns):
+    """
+    Return a function that builds cls instances from rows with these columns.
+    
+    The function is generated once per (class, column layout) and assigns
+    each column straight to its slot by position, skipping __init__ and
+    name lookups. Columns are renamed through cls.COLUMN_ATTRS, and slots
+    the query did not select get their value from cls.ROW_DEFAULTS.
+    """
+    key = (cls, tuple(columns))
+    mapper = _ROW_MAPPERS.get(key)
+    if mapper is None:
+        attrs = [cls.COLUMN_ATTRS.get(column, column) for column in key[1]]
+        unknown = set(attrs) - set(cls.__slots__)
+        if unknown:
+            raise ValueError(f'{cls.__name__} has no slots for columns {sorted(unknown)}')
+        
+        lines = ['def map_row(row):', '    obj = new(cls)']
+        lines += [f'    obj.{attr} = row[{index}]' for index, attr in enumerate(attrs)]
+        lines += [f'    obj.{attr} = defaults[{attr!r}]'
+                  for attr in cls.__slots__ if attr not in attrs]
+        lines.append('    return obj')
+        namespace = {'new': object.__new__, 'cls': cls, 'defaults': cls.ROW_DEFAULTS}
+        exec('\n'.join(lines), namespace)
+        mapper = _ROW_MAPPERS[key] = namespace['map_row']
+    return mapper
+
+
+def map_rows(cls, cursor):
+    """Build cls instances from all remaining rows of an executed cursor."""
+    mapper = row_mapper(cls, [column[0] for column in cursor.description])
+    return [mapper(row) for row in cursor.fetchall()]
+
+
+def _insert_many(conn, sql, objects, params):
+    """
+    Insert new objects with one executemany and assign their ids.
+    
+    The write lock is held for the whole transaction and the tables use
+    AUTOINCREMENT, so the batch receives consecutive rowids ending at
+    last_insert_rowid().
+    """
+    objects = [obj for obj in objects if obj.id is None]
+    if not objects:
+        return
+    conn.executemany(sql, [params(obj) for obj in objects])
+    last_id = conn.execute('SELECT last_insert_rowid()').fetchone()[0]
+    for offset, obj in enumerate(objects):
+        obj.id = last_id - len(objects) + 1 + offset
 
 
 class WeatherRequest:
     """Model for weather forecast requests."""
     
+    __slots__ = ('id', 'query', 'query_type', 'range_days', 'created_at', 'status')
+    COLUMN_ATTRS = {}
+    ROW_DEFAULTS = {'id': None, 'query': None, 'query_type': None, 'range_days': None,
+                    'created_at': None, 'status': 'created'}
+    
     def __init__(self, id=None, query=None, query_type=None, range_days=None, 
                  created_at=None, status='created'):
         self.id = id
@@ -87,35 +455,50 @@ class WeatherRequest:
     
     def save(self):
         """Save the request to database."""
-        conn = get_db_connection()
-        cursor = conn.cursor()
-        
-        if self.id is None:
-            cursor.execute('''
-                INSERT INTO weather_request (query, query_type, range_days, status)
-                VALUES (?, ?, ?, ?)
-            ''', (self.query, self.query_type, self.range_days, self.status))
-            self.id = cursor.lastrowid
-        else:
-            cursor.execute('''
-                UPDATE weather_request 
-                SET query = ?, query_type = ?, range_days = ?, status = ?
-                WHERE id = ?
-            ''', (self.query, self.query_type, self.range_days, self.status, self.id))
-        
-        conn.commit()
-        conn.close()
+        with transaction() as conn:
+            cursor = conn.cursor()
+            
+            if self.id is None:
+                cursor.execute('''
+                    INSERT INTO weather_request (query, query_type, range_days, status)
+                    VALUES (?, ?, ?, ?)
+                ''', (self.query, self.query_type, self.range_days, self.status))
+                self.id = cursor.lastrowid
+            else:
+                cursor.execute('''
+                    UPDATE weather_request 
+                    SET query = ?, query_type = ?, range_days = ?, status = ?
+                    WHERE id = ?
+                ''', (self.query, self.query_type, self.range_days, self.status, self.id))
         return self
     
     def update_status(self, status):
         """Update the request status."""
         self.status = status
-        conn = get_db_connection()
-        cursor = conn.cursor()
-        cursor.execute('UPDATE weather_request SET status = ? WHERE id = ?', 
-                      (status, self.id))
-        conn.commit()
-        conn.close()
+        with transaction() as conn:
+            cursor = conn.cursor()
+            cursor.execute('UPDATE weather_request SET status = ? WHERE id = ?', 
+                          (status, self.id))
+    
+    @staticmethod
+    def save_many(requests):
+        """
+        Insert new requests in one transaction with a single executemany.
+        
+        Args:
+            requests: WeatherRequest objects; ones that already have an id
+                      are skipped
+        
+        Returns:
+            list: The same requests, with ids assigned
+        """
+        requests = list(requests)
+        with transaction(immediate=True) as conn:
+            _insert_many(conn, '''
+                INSERT INTO weather_request (query, query_type, range_days, status)
+                VALUES (?, ?, ?, ?)
+            ''', requests, lambda r: (r.query, r.query_type, r.range_days, r.status))
+        return requests
     
     @staticmethod
     def get_by_id(request_id):
@@ -123,161 +506,681 @@ class WeatherRequest:
         conn = get_db_connection()
         cursor = conn.cursor()
         cursor.execute('SELECT * FROM weather_request WHERE id = ?', (request_id,))
-        row = cursor.fetchone()
-        conn.close()
-        
-        if row:
-            return WeatherRequest(
-                id=row['id'],
-                query=row['query'],
-                query_type=row['query_type'],
-                range_days=row['range_days'],
-                created_at=row['created_at'],
-                status=row['status']
-            )
-        return None
+        requests = map_rows(WeatherRequest, cursor)
+        return requests[0] if requests else None
     
     @staticmethod
     def get_all(limit=50):
         """Retrieve all requests, ordered by creation date."""
+        return WeatherRequest.get_page(limit)[0]
+    
+    @staticmethod
+    def get_page(limit=50, cursor=None):
+        """
+        Retrieve one page of requests, newest first, using keyset pagination.
+        
+        Args:
+            limit: Page size
+            cursor: Token from a previous page's next cursor, or None
+            
+        Returns:
+            tuple: (list of WeatherRequest, next cursor token or None)
+        """
+        position = decode_cursor(cursor)
         conn = get_db_connection()
         cursor = conn.cursor()
-        cursor.execute('''
-            SELECT * FROM weather_request 
-            ORDER BY created_at DESC 
-            LIMIT ?
-        ''', (limit,))
-        rows = cursor.fetchall()
-        conn.close()
+        if position:
+            cursor.execute('''
+                SELECT * FROM weather_request
+                WHERE (created_at, id) < (?, ?)
+                ORDER BY created_at DESC, id DESC
+                LIMIT ?
+            ''', (*position, limit))
+        else:
+            cursor.execute('''
+                SELECT * FROM weather_request
+                ORDER BY created_at DESC, id DESC
+                LIMIT ?
+            ''', (limit,))
+        requests = map_rows(WeatherRequest, cursor)
         
-        return [WeatherRequest(
-            id=row['id'],
-            query=row['query'],
-            query_type=row['query_type'],
-            range_days=row['range_days'],
-            created_at=row['created_at'],
-            status=row['status']
-        ) for row in rows]
+        next_cursor = None
+        if len(requests) == limit:
+            next_cursor = encode_cursor(requests[-1].created_at, requests[-1].id)
+        return requests, next_cursor
+    
+    @staticmethod
+    def iter_all(batch_size=500):
+        """Stream all requests, newest first, fetching batch_size rows at a time."""
+        cursor = None
+        while True:
+            requests, cursor = WeatherRequest.get_page(batch_size, cursor)
+            yield from requests
+            if cursor is None:
+                return
+
+
+# Placeholder for a column that is loaded on first access
+DEFERRED = object()
 
 
 class ForecastResult:
-    """Model for forecast results."""
+    """
+    Model for forecast results.
+    
+    forecast_data may be DEFERRED (listing queries skip the large column);
+    it is then fetched by id the first time it is accessed.
+    """
+    
+    __slots__ = ('id', 'request_id', 'location_name', 'country', 'latitude', 'longitude',
+                 '_forecast_data', 'current_temp', 'current_humidity', 'current_condition',
+                 'created_at', 'query', 'range_days', 'request_status')
+    COLUMN_ATTRS = {'forecast_data': '_forecast_data'}
+    # Joined request fields are only set by listing queries
+    ROW_DEFAULTS = dict.fromkeys(__slots__, None)
+    ROW_DEFAULTS['_forecast_data'] = DEFERRED
+    
+    # Columns the listing templates render; forecast_data is never included
+    LISTING_COLUMNS = (
+        'fr.id, fr.request_id, fr.location_name, fr.country, fr.latitude, fr.longitude, '
+        'fr.current_temp, fr.current_humidity, fr.current_condition, fr.created_at, '
+        'wr.query, wr.range_days, wr.status AS request_status'
+    )
+    # All forecast_result columns except forecast_data
+    SUMMARY_COLUMNS = (
+        'id, request_id, location_name, country, latitude, longitude, '
+        'current_temp, current_humidity, current_condition, created_at'
+    )
     
     def __init__(self, id=None, request_id=None, location_name=None, country=None,
                  latitude=None, longitude=None, forecast_data=None, current_temp=None,
-                 current_humidity=None, current_condition=None, created_at=None):
+                 current_humidity=None, current_condition=None, created_at=None,
+                 query=None, range_days=None, request_status=None):
         self.id = id
         self.request_id = request_id
         self.location_name = location_name
         self.country = country
         self.latitude = latitude
         self.longitude = longitude
-        self.forecast_data = forecast_data  # JSON string
+        self.forecast_data = forecast_data  # dict, encoded blob, JSON text or DEFERRED
         self.current_temp = current_temp
         self.current_humidity = current_humidity
         self.current_condition = current_condition
         self.created_at = created_at or datetime.now()
+        self.query = query
+        self.range_days = range_days
+        self.request_status = request_status
+    
+    @property
+    def forecast_data(self):
+        """Stored forecast data, loaded on first access when deferred."""
+        if self._forecast_data is DEFERRED:
+            conn = get_db_connection()
+            row = conn.execute('SELECT forecast_data FROM forecast_result WHERE id = ?',
+                               (self.id,)).fetchone()
+            self._forecast_data = row['forecast_data'] if row else None
+        return self._forecast_data
+    
+    @forecast_data.setter
+    def forecast_data(self, value):
+        self._forecast_data = value
     
     def save(self):
         """Save the result to database."""
-        conn = get_db_connection()
-        cursor = conn.cursor()
+        with transaction() as conn:
+            cursor = conn.cursor()
+            
+            forecast_blob = encode_forecast_data(self.forecast_data)
+            
+            if self.id is None:
+                cursor.execute('''
+                    INSERT INTO forecast_result 
+                    (request_id, location_name, country, latitude, longitude, 
+                     forecast_data, current_temp, current_humidity, current_condition)
+                    VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?)
+                ''', (self.request_id, self.location_name, self.country, 
+                      self.latitude, self.longitude, forecast_blob,
+                      self.current_temp, self.current_humidity, self.current_condition))
+                self.id = cursor.lastrowid
+            else:
+                cursor.execute('''
+                    UPDATE forecast_result 
+                    SET location_name = ?, country = ?, latitude = ?, longitude = ?,
+                        forecast_data = ?, current_temp = ?, current_humidity = ?, 
+                        current_condition = ?
+                    WHERE id = ?
+                ''', (self.location_name, self.country, self.latitude, self.longitude,
+                      forecast_blob, self.current_temp, self.current_humidity,
+                      self.current_condition, self.id))
+        return self
+    
+    @staticmethod
+    def save_many(results):
+        """
+        Insert new results in one transaction with a single executemany.
         
-        forecast_json = json.dumps(self.forecast_data) if isinstance(self.forecast_data, (dict, list)) else self.forecast_data
+        Args:
+            results: ForecastResult objects; ones that already have an id
+                     are skipped
         
-        if self.id is None:
-            cursor.execute('''
+        Returns:
+            list: The same results, with ids assigned
+        """
+        results = list(results)
+        with transaction(immediate=True) as conn:
+            _insert_many(conn, '''
                 INSERT INTO forecast_result 
                 (request_id, location_name, country, latitude, longitude, 
                  forecast_data, current_temp, current_humidity, current_condition)
                 VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?)
-            ''', (self.request_id, self.location_name, self.country, 
-                  self.latitude, self.longitude, forecast_json,
-                  self.current_temp, self.current_humidity, self.current_condition))
-            self.id = cursor.lastrowid
+            ''', results, lambda r: (r.request_id, r.location_name, r.country,
+                                     r.latitude, r.longitude,
+                                     encode_forecast_data(r.forecast_data),
+                                     r.current_temp, r.current_humidity,
+                                     r.current_condition))
+        return results
+    
+    def get_forecast_data(self):
+        """Decode and return forecast data as dictionary."""
+        if isinstance(self.forecast_data, (str, bytes, bytearray, memoryview)):
+            return codec.decode(self.forecast_data)
+        return self.forecast_data
+    
+    @staticmethod
+    def get_by_request_id(request_id, defer_data=False):
+        """
+        Retrieve result by request ID.
+        
+        Args:
+            request_id: WeatherRequest id
+            defer_data: Skip the forecast_data column; it is loaded on first
+                        access, so callers that may not need it stay cheap
+        """
+        columns = ForecastResult.SUMMARY_COLUMNS if defer_data else '*'
+        conn = get_db_connection()
+        cursor = conn.cursor()
+        cursor.execute(f'SELECT {columns} FROM forecast_result WHERE request_id = ?',
+                       (request_id,))
+        results = map_rows(ForecastResult, cursor)
+        return results[0] if results else None
+    
+    @staticmethod
+    def get_all_with_requests(limit=20):
+        """
+        Get recent results with their associated requests for listings.
+        
+        Only the columns the listing templates render are selected;
+        forecast_data is deferred until accessed.
+        """
+        return ForecastResult.get_page(limit)[0]
+    
+    @staticmethod
+    def get_page(limit=50, cursor=None):
+        """
+        Get one page of results with their requests, newest first.
+        
+        Uses keyset pagination on (created_at, id), so every page costs the
+        same however deep it is. Rows carry the listing columns only.
+        
+        Args:
+            limit: Page size
+            cursor: Token from a previous page's next cursor, or None
+            
+        Returns:
+            tuple: (list of ForecastResult, next cursor token or None)
+        """
+        position = decode_cursor(cursor)
+        where = 'WHERE (fr.created_at, fr.id) < (?, ?)' if position else ''
+        conn = get_db_connection()
+        cursor = conn.cursor()
+        cursor.execute(f'''
+            SELECT {ForecastResult.LISTING_COLUMNS}
+            FROM forecast_result fr
+            JOIN weather_request wr ON fr.request_id = wr.id
+            {where}
+            ORDER BY fr.created_at DESC, fr.id DESC
+            LIMIT ?
+        ''', (*(position or ()), limit))
+        results = map_rows(ForecastResult, cursor)
+        
+        next_cursor = None
+        if len(results) == limit:
+            next_cursor = encode_cursor(results[-1].created_at, results[-1].id)
+        return results, next_cursor
+    
+    @staticmethod
+    def iter_all(batch_size=500):
+        """Stream all results, newest first, fetching batch_size rows at a time."""
+        cursor = None
+        while True:
+            results, cursor = ForecastResult.get_page(batch_size, cursor)
+            yield from results
+            if cursor is None:
+                return
+    
+    @staticmethod
+    def find_nearby(latitude, longitude, radius_km, max_age_seconds, min_days=1, limit=20):
+        """
+        Find recent results stored within radius_km of a point.
+        
+        Candidates come from the R*Tree (or the position index) inside the
+        bounding box of the radius, then are filtered by great-circle
+        distance. Results of uploaded files are never returned, only
+        forecasts generated from WeatherAPI. forecast_data is deferred.
+        
+        Args:
+            latitude: Latitude of the point
+            longitude: Longitude of the point
+            radius_km: Search radius in kilometres
+            max_age_seconds: Ignore results created longer ago than this
+            min_days: Only results of requests for at least this many days
+            limit: Candidates examined, newest first
+            
+        Returns:
+            list: (distance_km, ForecastResult) pairs, nearest first
+        """
+        lat_delta = radius_km / 111.32
+        lon_delta = radius_km / max(111.32 * math.cos(math.radians(latitude)), 1e-6)
+        box = (latitude - lat_delta, latitude + lat_delta,
+               longitude - lon_delta, longitude + lon_delta)
+        
+        conn = get_db_connection()
+        if has_spatial_index(conn):
+            source = f'''
+                FROM {SPATIAL_INDEX_TABLE} r
+                JOIN forecast_result fr ON fr.id = r.id
+                JOIN weather_request wr ON wr.id = fr.request_id
+                WHERE r.max_lat >= ? AND r.min_lat <= ? AND r.max_lon >= ? AND r.min_lon <= ?
+            '''
         else:
+            source = '''
+                FROM forecast_result fr
+                JOIN weather_request wr ON wr.id = fr.request_id
+                WHERE fr.latitude >= ? AND fr.latitude <= ?
+                  AND fr.longitude >= ? AND fr.longitude <= ?
+            '''
+        cursor = conn.cursor()
+        cursor.execute(f'''
+            SELECT {ForecastResult.LISTING_COLUMNS}
+            {source}
+              AND fr.created_at >= datetime('now', ?) AND wr.range_days >= ?
+              AND wr.query_type != 'json_upload'
+            ORDER BY fr.id DESC
+            LIMIT ?
+        ''', (*box, f'-{int(max_age_seconds)} seconds', min_days, limit))
+        
+        nearby = []
+        for result in map_rows(ForecastResult, cursor):
+            distance = geo.haversine_km(latitude, longitude, result.latitude, result.longitude)
+            if distance <= radius_km:
+                nearby.append((distance, result))
+        nearby.sort(key=lambda pair: pair[0])
+        return nearby
+    
+    @staticmethod
+    def latest_id():
+        """Return the id of the newest stored result (0 when there is none)."""
+        conn = get_db_connection()
+        return conn.execute('SELECT MAX(id) FROM forecast_result').fetchone()[0] or 0
+    
+    @staticmethod
+    def count():
+        """Return the number of stored forecast results."""
+        conn = get_db_connection()
+        return conn.execute('SELECT COUNT(*) FROM forecast_result').fetchone()[0]
+
+
+class ForecastJob:
+    """Model for queued forecast jobs processed by background workers."""
+    
+    def __init__(self, id=None, request_id=None, status='queued', payload=None,
+                 error=None, attempts=0):
+        self.id = id
+        self.request_id = request_id
+        self.status = status
+        self.payload = payload
+        self.error = error
+        self.attempts = attempts
+    
+    @staticmethod
+    def _from_row(row):
+        return ForecastJob(
+            id=row['id'],
+            request_id=row['request_id'],
+            status=row['status'],
+            payload=json.loads(row['payload']) if row['payload'] else None,
+            error=row['error'],
+            attempts=row['attempts']
+        )
+    
+    @staticmethod
+    def enqueue(request_id, payload=None):
+        """
+        Queue a request for processing; a request is only queued once.
+        
+        Returns:
+            bool: True if a new job was queued
+        """
+        with transaction() as conn:
+            cursor = conn.cursor()
             cursor.execute('''
-                UPDATE forecast_result 
-                SET location_name = ?, country = ?, latitude = ?, longitude = ?,
-                    forecast_data = ?, current_temp = ?, current_humidity = ?, 
-                    current_condition = ?
-                WHERE id = ?
-            ''', (self.location_name, self.country, self.latitude, self.longitude,
-                  forecast_json, self.current_temp, self.current_humidity,
-                  self.current_condition, self.id))
+                INSERT OR IGNORE INTO forecast_job (request_id, payload)
+                VALUES (?, ?)
+            ''', (request_id, json.dumps(payload) if payload is not None else None))
+            queued = cursor.rowcount == 1
+        return queued
+    
+    @staticmethod
+    def claim_next():
+        """
+        Atomically claim the oldest queued job.
         
-        conn.commit()
-        conn.close()
-        return self
+        Returns:
+            ForecastJob: The claimed job, now 'running', or None
+        """
+        with transaction(immediate=True) as conn:
+            cursor = conn.cursor()
+            cursor.execute('''
+                SELECT * FROM forecast_job WHERE status = 'queued'
+                ORDER BY id LIMIT 1
+            ''')
+            row = cursor.fetchone()
+            if row:
+                cursor.execute('''
+                    UPDATE forecast_job
+                    SET status = 'running', attempts = attempts + 1,
+                        started_at = CURRENT_TIMESTAMP
+                    WHERE id = ?
+                ''', (row['id'],))
+        
+        if row:
+            job = ForecastJob._from_row(row)
+            job.status = 'running'
+            job.attempts += 1
+            return job
+        return None
     
-    def get_forecast_data(self):
-        """Parse and return forecast data as dictionary."""
-        if isinstance(self.forecast_data, str):
-            return json.loads(self.forecast_data)
-        return self.forecast_data
+    def finish(self, error=None):
+        """Mark the job done, or failed with an error message."""
+        self.status = 'failed' if error else 'done'
+        self.error = error
+        with transaction() as conn:
+            cursor = conn.cursor()
+            cursor.execute('''
+                UPDATE forecast_job
+                SET status = ?, error = ?, payload = NULL, finished_at = CURRENT_TIMESTAMP
+                WHERE id = ?
+            ''', (self.status, error, self.id))
+    
+    @staticmethod
+    def requeue_stale(max_age_seconds, max_attempts):
+        """
+        Recover jobs left 'running' by a worker that died.
+        
+        Jobs that have already been claimed max_attempts times are marked
+        failed, along with their request, instead of being retried again.
+        
+        Returns:
+            tuple: (jobs re-queued, jobs failed)
+        """
+        stale = (f'-{int(max_age_seconds)} seconds', max_attempts)
+        with transaction() as conn:
+            cursor = conn.cursor()
+            cursor.execute('''
+                UPDATE weather_request SET status = 'failed'
+                WHERE id IN (
+                    SELECT request_id FROM forecast_job
+                    WHERE status = 'running' AND started_at < datetime('now', ?)
+                      AND attempts >= ?
+                )
+            ''', stale)
+            cursor.execute('''
+                UPDATE forecast_job
+                SET status = 'failed', payload = NULL, finished_at = CURRENT_TIMESTAMP,
+                    error = 'Forecast processing stopped ' || attempts || ' times; giving up'
+                WHERE status = 'running' AND started_at < datetime('now', ?)
+                  AND attempts >= ?
+            ''', stale)
+            failed = cursor.rowcount
+            cursor.execute('''
+                UPDATE forecast_job SET status = 'queued'
+                WHERE status = 'running' AND started_at < datetime('now', ?)
+            ''', stale[:1])
+            requeued = cursor.rowcount
+        return requeued, failed
     
     @staticmethod
     def get_by_request_id(request_id):
-        """Retrieve result by request ID."""
+        """Retrieve the job for a request."""
         conn = get_db_connection()
         cursor = conn.cursor()
-        cursor.execute('SELECT * FROM forecast_result WHERE request_id = ?', (request_id,))
+        cursor.execute('SELECT * FROM forecast_job WHERE request_id = ?', (request_id,))
         row = cursor.fetchone()
-        conn.close()
         
         if row:
-            return ForecastResult(
-                id=row['id'],
-                request_id=row['request_id'],
-                location_name=row['location_name'],
-                country=row['country'],
-                latitude=row['latitude'],
-                longitude=row['longitude'],
-                forecast_data=row['forecast_data'],
-                current_temp=row['current_temp'],
-                current_humidity=row['current_humidity'],
-                current_condition=row['current_condition'],
-                created_at=row['created_at']
-            )
+            return ForecastJob._from_row(row)
         return None
+
+
+class ForecastProgress:
+    """Model for the progress event log of forecast jobs."""
     
     @staticmethod
-    def get_all_with_requests(limit=20):
-        """Get all results with their associated requests."""
+    def append(request_id, event, data=None):
+        """
+        Append an event to a request's log.
+        
+        Returns:
+            int: Sequence number of the event (1 for the first)
+        """
+        with transaction() as conn:
+            conn.execute('''
+                INSERT INTO forecast_progress (request_id, seq, event, data, created_at)
+                SELECT ?, COALESCE(MAX(seq), 0) + 1, ?, ?, ?
+                FROM forecast_progress WHERE request_id = ?
+            ''', (request_id, event, json.dumps(data or {}), time.time(), request_id))
+            seq = conn.execute('SELECT MAX(seq) FROM forecast_progress WHERE request_id = ?',
+                               (request_id,)).fetchone()[0]
+        return seq
+    
+    @staticmethod
+    def since(request_id, after=0):
+        """
+        Retrieve a request's events with a sequence number above after.
+        
+        Returns:
+            list: (sequence, event, data) tuples in order
+        """
+        conn = get_db_connection()
+        rows = conn.execute('''
+            SELECT seq, event, data FROM forecast_progress
+            WHERE request_id = ? AND seq > ?
+            ORDER BY seq
+        ''', (request_id, after)).fetchall()
+        return [(row['seq'], row['event'], json.loads(row['data'])) for row in rows]
+    
+    @staticmethod
+    def purge_finished(max_age_seconds):
+        """Delete the logs of requests that finished over max_age_seconds ago."""
+        with transaction() as conn:
+            cursor = conn.cursor()
+            cursor.execute('''
+                DELETE FROM forecast_progress WHERE request_id IN (
+                    SELECT request_id FROM forecast_progress
+                    WHERE event IN ('done', 'error') AND created_at < ?
+                )
+            ''', (time.time() - max_age_seconds,))
+            removed = cursor.rowcount
+        return removed
+
+
+class HistoricalCache:
+    """Model for cached historical weather days (past days never change)."""
+    
+    @staticmethod
+    def _to_history(date, row):
+        """Rebuild a history.json shaped dict from a cached row."""
+        return {
+            'forecast': {
+                'forecastday': [{
+                    'date': date,
+                    'day': {
+                        'avgtemp_c': row['avg_temp'],
+                        'maxtemp_c': row['max_temp'],
+                        'mintemp_c': row['min_temp'],
+                        'avghumidity': row['humidity'],
+                        'condition': {'text': row['condition']}
+                    }
+                }]
+            },
+            'cached': True
+        }
+    
+    @staticmethod
+    def get_many(location_query, dates):
+        """
+        Retrieve cached history days for a location.
+        
+        Args:
+            location_query: Location query the days were fetched for
+            dates: Iterable of date strings in YYYY-MM-DD format
+            
+        Returns:
+            dict: Mapping of date string to history.json shaped dict
+        """
+        dates = list(dates)
+        if not dates:
+            return {}
+        
         conn = get_db_connection()
         cursor = conn.cursor()
-        cursor.execute('''
-            SELECT fr.*, wr.query, wr.range_days, wr.status as request_status
-            FROM forecast_result fr
-            JOIN weather_request wr ON fr.request_id = wr.id
-            ORDER BY fr.created_at DESC
-            LIMIT ?
-        ''', (limit,))
+        placeholders = ', '.join('?' for _ in dates)
+        cursor.execute(f'''
+            SELECT date, avg_temp, max_temp, min_temp, humidity, condition
+            FROM historical_cache
+            WHERE location_query = ? AND date IN ({placeholders})
+        ''', (location_query, *dates))
         rows = cursor.fetchall()
-        conn.close()
         
-        results = []
-        for row in rows:
-            result = ForecastResult(
-                id=row['id'],
-                request_id=row['request_id'],
-                location_name=row['location_name'],
-                country=row['country'],
-                latitude=row['latitude'],
-                longitude=row['longitude'],
-                forecast_data=row['forecast_data'],
-                current_temp=row['current_temp'],
-                current_humidity=row['current_humidity'],
-                current_condition=row['current_condition'],
-                created_at=row['created_at']
-            )
-            result.query = row['query']
-            result.range_days = row['range_days']
-            result.request_status = row['request_status']
-            results.append(result)
+        return {row['date']: HistoricalCache._to_history(row['date'], row) for row in rows}
+    
+    @staticmethod
+    def get(location_query, date):
+        """Retrieve a single cached history day or None."""
+        return HistoricalCache.get_many(location_query, [date]).get(date)
+    
+    @staticmethod
+    def save(location_query, date, history_data):
+        """
+        Store the day summary of a history.json response.
         
-        return results
+        Args:
+            location_query: Location query the day was fetched for
+            date: Date string in YYYY-MM-DD format
+            history_data: Raw history.json response dict
+            
+        Returns:
+            bool: True if the day was stored
+        """
+        forecast_day = history_data.get('forecast', {}).get('forecastday', [])
+        if not forecast_day:
+            return False
+        day = forecast_day[0].get('day', {})
+        
+        with transaction() as conn:
+            cursor = conn.cursor()
+            cursor.execute('''
+                INSERT OR REPLACE INTO historical_cache
+                (location_query, date, avg_temp, max_temp, min_temp, humidity, condition)
+                VALUES (?, ?, ?, ?, ?, ?, ?)
+            ''', (location_query, date, day.get('avgtemp_c'), day.get('maxtemp_c'),
+                  day.get('mintemp_c'), day.get('avghumidity'),
+                  day.get('condition', {}).get('text')))
+        return True
+
+
+class ResponseCache:
+    """Model for the persistent tier of the upstream response cache."""
+    
+    @staticmethod
+    def get(cache_key):
+        """
+        Retrieve a cached response.
+        
+        Returns:
+            tuple: (payload, expires_at) or None if missing or expired
+        """
+        conn = get_db_connection()
+        cursor = conn.cursor()
+        cursor.execute('''
+            SELECT payload, expires_at FROM response_cache
+            WHERE cache_key = ? AND expires_at > ?
+        ''', (cache_key, time.time()))
+        row = cursor.fetchone()
+        
+        if row:
+            return json.loads(row['payload']), row['expires_at']
+        return None
+    
+    _writes = count(1)
+    
+    @staticmethod
+    def set(cache_key, payload, expires_at):
+        """
+        Store a response until expires_at (epoch seconds).
+        
+        Every RESPONSE_CACHE_PURGE_EVERY writes also delete the expired
+        entries, which reads skip but nothing else removes.
+        """
+        purge = (RESPONSE_CACHE_PURGE_EVERY > 0
+                 and next(ResponseCache._writes) % RESPONSE_CACHE_PURGE_EVERY == 0)
+        with transaction() as conn:
+            conn.execute('''
+                INSERT OR REPLACE INTO response_cache (cache_key, payload, expires_at)
+                VALUES (?, ?, ?)
+            ''', (cache_key, json.dumps(payload), expires_at))
+            if purge:
+                ResponseCache.purge_expired()
+    
+    @staticmethod
+    def purge_expired():
+        """Delete expired entries and return how many were removed."""
+        with transaction() as conn:
+            cursor = conn.cursor()
+            cursor.execute('DELETE FROM response_cache WHERE expires_at <= ?', (time.time(),))
+            removed = cursor.rowcount
+        return removed
 
 
-# Initialize database on import
-init_db()
+class LocationAlias:
+    """Model mapping normalized named queries to the grid cell they resolved to."""
+    
+    @staticmethod
+    def get(query_key):
+        """
+        Retrieve where a normalized query resolved to.
+        
+        Returns:
+            tuple: (location_key, latitude, longitude), or None if the query
+                   has not been resolved yet
+        """
+        conn = get_db_connection()
+        row = conn.execute('''
+            SELECT location_key, latitude, longitude FROM location_alias
+            WHERE query_key = ?
+        ''', (query_key,)).fetchone()
+        return tuple(row) if row else None
+    
+    @staticmethod
+    def save(query_key, location_key, latitude, longitude):
+        """Record (or update) where a normalized query resolved to."""
+        with transaction() as conn:
+            conn.execute('''
+                INSERT INTO location_alias (query_key, location_key, latitude, longitude)
+                VALUES (?, ?, ?, ?)
+                ON CONFLICT(query_key) DO UPDATE SET
+                    location_key = excluded.location_key,
+                    latitude = excluded.latitude,
+                    longitude = excluded.longitude,
+                    updated_at = CURRENT_TIMESTAMP
+            ''', (query_key, location_key, latitude, longitude))
@@ -0,0 +1,163 @@
+"""
+Galaxy Weather - Online Statistics
+Single-pass, mergeable summary statistics for streams of readings.
+"""
+
+import math
+
+
+class RunningStats:
+    """
+    Constant-memory accumulator for a sequence of numeric values.
+
+    Tracks count, min/max, mean and variance (Welford's algorithm) and the
+    least-squares slope of the values against their position in the
+    sequence. Partial states built over consecutive chunks can be combined
+    with merge(), which gives the same result as one pass over the whole
+    sequence, so input can be split and reduced in parallel.
+    """
+
+    __slots__ = ('count', 'mean', 'm2', 'min', 'max',
+                 'index_mean', 'index_m2', 'co_moment')
+
+    def __init__(self):
+        self.count = 0
+        self.mean = 0.0
+        self.m2 = 0.0
+        self.min = None
+        self.max = None
+        # Position statistics for the slope; positions run 0..count-1
+        self.index_mean = 0.0
+        self.index_m2 = 0.0
+        self.co_moment = 0.0
+
+    def add(self, value):
+        """Consume the next value of the sequence."""
+        value = float(value)
+        index = self.count
+        self.count += 1
+        dx = index - self.index_mean
+        dy = value - self.mean
+        self.index_mean += dx / self.count
+        self.mean += dy / self.count
+        self.m2 += dy * (value - self.mean)
+        self.index_m2 += dx * (index - self.index_mean)
+        self.co_moment += dx * (value - self.mean)
+        if self.min is None or value < self.min:
+            self.min = value
+        if self.max is None or value > self.max:
+            self.max = value
+
+    def update(self, values):
+        """Consume every value of an iterable, in order."""
+        for value in values:
+            self.add(value)
+        return self
+
+    def merge(self, other):
+        """
+        Append the state of the chunk that follows this one in the sequence.
+
+        Args:
+            other: RunningStats built over the next consecutive values
+
+        Returns:
+            RunningStats: self, now covering both chunks
+        """
+        if not other.count:
+            return self
+        if not self.count:
+            for name in self.__slots__:
+                setattr(self, name, getattr(other, name))
+            return self
+
+        na, nb = self.count, other.count
+        n = na + nb
+        # The other chunk's positions continue after this one's
+        dx = other.index_mean + na - self.index_mean
+        dy = other.mean - self.mean
+        weight = na * nb / n
+
+        self.m2 += other.m2 + dy * dy * weight
+        self.index_m2 += other.index_m2 + dx * dx * weight
+        self.co_moment += other.co_moment + dx * dy * weight
+        self.mean += dy * nb / n
+        self.index_mean += dx * nb / n
+        self.count = n
+        self.min = min(self.min, other.min)
+        self.max = max(self.max, other.max)
+        return self
+
+    @property
+    def variance(self):
+        """Sample variance (0 with fewer than two values)."""
+        return self.m2 / (self.count - 1) if self.count > 1 else 0.0
+
+    @property
+    def stdev(self):
+        """Sample standard deviation."""
+        return math.sqrt(self.variance)
+
+    @property
+    def slope(self):
+        """Least-squares change per position (0 with fewer than two values)."""
+        return self.co_moment / self.index_m2 if self.index_m2 else 0
+
+    def summary(self):
+        """Return the statistics as a JSON-serializable dict."""
+        return {
+            'count': self.count,
+            'mean': self.mean if self.count else 0,
+            'stdev': self.stdev,
+            'min': self.min,
+            'max': self.max,
+            'slope': self.slope
+        }
+
+
+class ReadingStats:
+    """
+    Mergeable aggregate of uploaded weather readings.
+
+    Readings are dicts; 'temperature' and 'temp' values feed the
+    temperature statistics (both, when a reading has both keys) and
+    'humidity' values the humidity statistics. Non-dict entries are
+    counted as data points but otherwise ignored.
+    """
+
+    __slots__ = ('data_points', 'temperature', 'humidity')
+
+    def __init__(self):
+        self.data_points = 0
+        self.temperature = RunningStats()
+        self.humidity = RunningStats()
+
+    def add(self, reading):
+        """Consume the next reading."""
+        self.data_points += 1
+        if not isinstance(reading, dict):
+            return
+        if 'temperature' in reading:
+            self.temperature.add(reading['temperature'])
+        if 'temp' in reading:
+            self.temperature.add(reading['temp'])
+        if 'humidity' in reading:
+            self.humidity.add(reading['humidity'])
+
+    def update(self, readings):
+        """Consume every reading of an iterable, in order."""
+        for reading in readings:
+            self.add(reading)
+        return self
+
+    def merge(self, other):
+        """Append the state of the chunk of readings that follows this one."""
+        self.data_points += other.data_points
+        self.temperature.merge(other.temperature)
+        self.humidity.merge(other.humidity)
+        return self
+
+
+def summarize_readings(readings):
+    """Reduce a chunk of readings to a ReadingStats (process pool entry point)."""
+    return ReadingStats().update(readings)
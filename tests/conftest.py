@@ -0,0 +1,45 @@
+"""
+Shared fixtures: an isolated database and an app whose jobs run inline.
+"""
+
+import os
+import sys
+
+import pytest
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import jobs
+import models
+
+
+@pytest.fixture
+def db(tmp_path, monkeypatch):
+    """A fresh, migrated database for the test."""
+    monkeypatch.setattr(models, 'DATABASE_PATH', str(tmp_path / 'test.db'))
+    models.init_db()
+
+
+@pytest.fixture
+def app_module(db, monkeypatch):
+    """The app module bootstrapped against a fresh database, with no worker threads."""
+    monkeypatch.setattr(jobs, 'FORECAST_WORKERS', 0)
+    import app
+    monkeypatch.setattr(app, '_bootstrapped', False)
+    app.page_cache.clear()
+    app.bootstrap()
+    return app
+
+
+@pytest.fixture
+def client(app_module):
+    return app_module.app.test_client()
+
+
+def run_queued_jobs(app_module):
+    """Process every queued forecast job on the calling thread."""
+    while True:
+        job = models.ForecastJob.claim_next()
+        if job is None:
+            return
+        app_module.job_queue.process(job)
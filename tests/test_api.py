@@ -0,0 +1,45 @@
+"""
+/api/forecast caching: freshness is counted from when a forecast was generated.
+"""
+
+from datetime import datetime, timedelta, timezone
+
+import pytest
+
+
+def generated(seconds_ago):
+    at = datetime.now(timezone.utc) - timedelta(seconds=seconds_ago)
+    return {'location': {'name': 'London'}, 'current': {}, 'forecast_days': [],
+            'generated_at': at.isoformat()}
+
+
+@pytest.fixture
+def serve(app_module, monkeypatch):
+    def serve(forecast):
+        monkeypatch.setattr(app_module.forecast_engine, 'generate_forecast',
+                            lambda query, days: forecast)
+        return app_module.app.test_client().get('/api/forecast?location=London&days=3')
+    return serve
+
+
+def test_fresh_forecast_gets_full_max_age(app_module, serve):
+    response = serve(generated(0))
+    assert response.status_code == 200
+    assert app_module.API_CACHE_MAX_AGE - 2 <= response.cache_control.max_age <= app_module.API_CACHE_MAX_AGE
+    assert response.last_modified is not None
+
+
+def test_reused_forecast_max_age_counts_its_age(app_module, serve):
+    response = serve(generated(app_module.API_CACHE_MAX_AGE - 100))
+    assert 98 <= response.cache_control.max_age <= 100
+
+    response = serve(generated(app_module.API_CACHE_MAX_AGE + 1000))
+    assert response.cache_control.max_age == 0
+
+
+def test_forecast_without_generated_at(app_module, serve):
+    forecast = generated(0)
+    del forecast['generated_at']
+    response = serve(forecast)
+    assert response.cache_control.max_age == app_module.API_CACHE_MAX_AGE
+    assert response.last_modified is None
@@ -0,0 +1,62 @@
+"""
+Streaming upload parsing: chunk boundaries, malformed input and limits.
+"""
+
+import io
+import json
+
+import pytest
+
+import ingest
+
+
+class CountingStream(io.BytesIO):
+    """BytesIO that records how many bytes were read."""
+
+    def __init__(self, data):
+        super().__init__(data)
+        self.bytes_read = 0
+
+    def read(self, size=-1):
+        data = super().read(size)
+        self.bytes_read += len(data)
+        return data
+
+
+def records(data, **kwargs):
+    is_array, iterator = ingest.open_records(io.BytesIO(data), **kwargs)
+    return is_array, list(iterator)
+
+
+@pytest.mark.parametrize('chunk_size', [1, 2, 3, 7, 64])
+def test_values_split_across_chunks(chunk_size):
+    readings = [{'temp': -1.5e2, 'name': 'café \\u00e9', 'ok': True, 'n': None},
+                {'temperature': 12345678901234, 'humidity': 55.25}]
+    data = json.dumps(readings, ensure_ascii=False).encode()
+    assert records(data, chunk_size=chunk_size) == (True, readings)
+
+    ndjson = b'\n'.join(json.dumps(r, ensure_ascii=False).encode() for r in readings)
+    assert records(ndjson, chunk_size=chunk_size) == (False, readings)
+
+
+def test_malformed_record_fails_without_buffering_the_rest():
+    good = json.dumps({'temperature': 20, 'humidity': 50}).encode()
+    data = b'[' + good + b', {"temperature": oops}, ' + b', '.join([good] * 200000) + b']'
+    stream = CountingStream(data)
+    _, iterator = ingest.open_records(stream, chunk_size=4096)
+    with pytest.raises(json.JSONDecodeError):
+        list(iterator)
+    assert stream.bytes_read <= 2 * 4096
+
+
+def test_truncated_upload_raises():
+    with pytest.raises(json.JSONDecodeError):
+        records(b'[{"temperature": 20}, {"temperature": 2', chunk_size=8)
+
+
+def test_record_size_limit(monkeypatch):
+    monkeypatch.setattr(ingest, 'MAX_RECORD_BYTES', 1024)
+    huge = json.dumps([{'note': 'x' * 5000}]).encode()
+    with pytest.raises(ValueError, match='larger than 1024'):
+        records(huge, chunk_size=64)
+    assert records(json.dumps([{'note': 'x' * 500}]).encode(), chunk_size=64)[1][0]['note'] == 'x' * 500
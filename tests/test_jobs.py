@@ -0,0 +1,108 @@
+"""
+Forecast job queueing: submissions are queued at once, /process only
+reports, and jobs orphaned by dead workers are retried a bounded number
+of times.
+"""
+
+import time
+
+import jobs
+from conftest import run_queued_jobs
+from models import ForecastJob, WeatherRequest, get_db_connection, transaction
+
+FORECAST = {
+    'location': {'name': 'London', 'country': 'UK', 'lat': 51.52, 'lon': -0.11},
+    'current': {'temp_c': 12.0, 'humidity': 70, 'condition': 'Cloudy'},
+    'analysis': None,
+    'forecast_days': [],
+}
+
+
+def submit(client, location='London'):
+    response = client.post('/forecast', data={'location': location, 'days': '3'})
+    assert response.status_code == 302
+    return int(response.headers['Location'].split('/loading/')[1].split('?')[0])
+
+
+def test_submission_is_queued_without_process_call(app_module, client, monkeypatch):
+    monkeypatch.setattr(app_module.forecast_engine, 'generate_forecast',
+                        lambda query, days, progress=None: FORECAST)
+    request_id = submit(client)
+    assert ForecastJob.get_by_request_id(request_id).status == 'queued'
+
+    run_queued_jobs(app_module)
+    assert WeatherRequest.get_by_id(request_id).status == 'completed'
+    assert client.get(f'/forecast/{request_id}').status_code == 200
+
+
+def test_process_only_reports_status(app_module, client, monkeypatch):
+    monkeypatch.setattr(app_module.forecast_engine, 'generate_forecast',
+                        lambda query, days, progress=None: FORECAST)
+    request_id = submit(client)
+
+    for _ in range(2):
+        response = client.post(f'/process/{request_id}')
+        assert response.status_code == 202
+        assert response.get_json()['queued'] is True
+    assert get_db_connection().execute('SELECT COUNT(*) FROM forecast_job').fetchone()[0] == 1
+
+    run_queued_jobs(app_module)
+    response = client.post(f'/process/{request_id}')
+    assert response.get_json()['redirect'].endswith(f'/forecast/{request_id}')
+    assert client.post('/process/999').status_code == 404
+
+
+def age_running_jobs():
+    with transaction() as conn:
+        conn.execute("UPDATE forecast_job SET started_at = datetime('now', '-1 hour') "
+                     "WHERE status = 'running'")
+
+
+def test_stale_jobs_fail_after_max_attempts(app_module, client):
+    request_id = submit(client)
+
+    for attempt in range(1, 3):
+        assert ForecastJob.claim_next().attempts == attempt
+        age_running_jobs()
+        assert ForecastJob.requeue_stale(300, max_attempts=3) == (1, 0)
+
+    assert ForecastJob.claim_next().attempts == 3
+    assert ForecastJob.requeue_stale(300, max_attempts=3) == (0, 0)
+    age_running_jobs()
+    assert ForecastJob.requeue_stale(300, max_attempts=3) == (0, 1)
+
+    job = ForecastJob.get_by_request_id(request_id)
+    assert job.status == 'failed' and 'giving up' in job.error
+    assert WeatherRequest.get_by_id(request_id).status == 'failed'
+    assert ForecastJob.claim_next() is None
+    assert client.get(f'/status/{request_id}').get_json()['status'] == 'failed'
+
+
+def test_worker_sweep_is_throttled(app_module):
+    assert app_module.job_queue.sweep() is True
+    assert app_module.job_queue.sweep() is False
+
+
+def test_jobs_queued_before_bootstrap_are_processed(db, monkeypatch):
+    monkeypatch.setattr(jobs, 'FORECAST_WORKERS', 1)
+    monkeypatch.setattr(jobs, 'JOB_POLL_INTERVAL', 0.05)
+    weather_request = WeatherRequest(query='JSON Upload', query_type='json_upload',
+                                     range_days=3, status='processing').save()
+    ForecastJob.enqueue(weather_request.id, {'upload_result': {
+        'source': 'uploaded_json',
+        'current': {'temp_c': 20.0, 'humidity': 50, 'condition': 'Sunny'},
+    }})
+
+    import app
+    monkeypatch.setattr(app, '_bootstrapped', False)
+    app.bootstrap()
+    try:
+        deadline = time.time() + 5
+        while time.time() < deadline:
+            if WeatherRequest.get_by_id(weather_request.id).status == 'completed':
+                break
+            time.sleep(0.05)
+        assert WeatherRequest.get_by_id(weather_request.id).status == 'completed'
+        assert ForecastJob.get_by_request_id(weather_request.id).status == 'done'
+    finally:
+        app.job_queue.stop()
@@ -0,0 +1,68 @@
+"""
+Model-level storage behaviour.
+"""
+
+import json
+import time
+
+import codec
+import models
+from models import ForecastResult, ResponseCache, get_db_connection, init_db, transaction
+
+
+def cached_keys():
+    rows = get_db_connection().execute('SELECT cache_key FROM response_cache ORDER BY cache_key')
+    return [row[0] for row in rows]
+
+
+def test_response_cache_purges_expired_rows_on_writes(db, monkeypatch):
+    monkeypatch.setattr(models, 'RESPONSE_CACHE_PURGE_EVERY', 3)
+    monkeypatch.setattr(ResponseCache, '_writes', models.count(1))
+    now = time.time()
+
+    ResponseCache.set('expired', {'v': 1}, now - 10)
+    ResponseCache.set('live', {'v': 2}, now + 60)
+    assert cached_keys() == ['expired', 'live']
+    assert ResponseCache.get('expired') is None
+
+    ResponseCache.set('other', {'v': 3}, now + 60)
+    assert cached_keys() == ['live', 'other']
+    assert ResponseCache.get('live') == ({'v': 2}, now + 60)
+
+
+def test_compress_migration_rewrites_legacy_rows(tmp_path, monkeypatch):
+    monkeypatch.setattr(models, 'DATABASE_PATH', str(tmp_path / 'legacy.db'))
+    with monkeypatch.context() as legacy:
+        legacy.setattr(models, 'SCHEMA_MIGRATIONS', models.SCHEMA_MIGRATIONS[:2])
+        legacy.setattr(models, 'SCHEMA_VERSION', 2)
+        assert init_db() == 2
+
+    # More rows than one migration batch, written the way version 2 stored them
+    forecasts = {i: {'location': {'name': f'Town {i}', 'lat': i / 10}, 'note': 'ünïcode ☀',
+                     'forecast_days': [{'day': d, 'temp_c': {'avg': d + 0.5}} for d in range(3)]}
+                 for i in range(1, 1201)}
+    encoded = {'already': 'encoded'}
+    with transaction() as conn:
+        conn.execute("INSERT INTO weather_request (id, query, query_type, range_days) "
+                     "VALUES (1, 'London', 'city', 3)")
+        conn.executemany('INSERT INTO forecast_result (id, request_id, forecast_data) VALUES (?, 1, ?)',
+                         [(i, json.dumps(data)) for i, data in forecasts.items()])
+        conn.execute('INSERT INTO forecast_result (id, request_id, forecast_data) VALUES (?, 1, ?)',
+                     (2000, codec.encode(encoded)))
+        conn.execute("INSERT INTO forecast_result (id, request_id, forecast_data) "
+                     "VALUES (2001, 1, 'not json')")
+
+    assert init_db() == models.SCHEMA_VERSION
+
+    conn = get_db_connection()
+    types = dict(conn.execute('SELECT id, typeof(forecast_data) FROM forecast_result').fetchall())
+    assert all(types[i] == 'blob' for i in forecasts)
+    assert types[2000] == 'blob' and types[2001] == 'text'
+
+    stored = {result.id: result for result in ForecastResult.iter_all()}
+    for i, data in forecasts.items():
+        assert codec.is_encoded(stored[i].forecast_data)
+        assert stored[i].get_forecast_data() == data
+    assert stored[2000].get_forecast_data() == encoded
+    assert codec.decode(conn.execute('SELECT forecast_data FROM forecast_result WHERE id = 2000')
+                        .fetchone()[0]) == encoded
@@ -0,0 +1,57 @@
+"""
+Nearby forecast reuse: only WeatherAPI results are served for nearby queries.
+"""
+
+import io
+import json
+from datetime import datetime, timezone
+
+from conftest import run_queued_jobs
+from models import ForecastResult, WeatherRequest
+
+LONDON = (51.5074, -0.1278)
+
+
+def forecast_data(name):
+    return {
+        'forecast': {'forecastday': []},
+        'location': {'name': name, 'country': 'UK', 'lat': LONDON[0], 'lon': LONDON[1]},
+        'current': {'temp_c': 99.0, 'humidity': 1, 'condition': name},
+        'forecast_days': [{'date': f'2026-01-0{i + 1}'} for i in range(7)],
+        'generated_at': datetime.now(timezone.utc).isoformat(),
+    }
+
+
+def save_api_result(data):
+    weather_request = WeatherRequest(query='London', query_type='city', range_days=7,
+                                     status='completed').save()
+    return ForecastResult(request_id=weather_request.id, location_name=data['location']['name'],
+                          latitude=LONDON[0], longitude=LONDON[1], forecast_data=data).save()
+
+
+def upload_forecast(client, app_module, data):
+    response = client.post('/forecast', data={
+        'location': '',
+        'days': '7',
+        'json_file': (io.BytesIO(json.dumps(data).encode()), 'forecast.json'),
+    }, content_type='multipart/form-data')
+    assert response.status_code == 302
+    run_queued_jobs(app_module)
+
+
+def test_uploaded_forecast_is_never_reused(app_module, client):
+    upload_forecast(client, app_module, forecast_data('Uploaded'))
+    assert ForecastResult.count() == 1
+
+    assert ForecastResult.find_nearby(51.5080, -0.1270, 5, 1800) == []
+    assert app_module.forecast_engine.find_nearby_result('51.5080,-0.1270', 3) is None
+
+
+def test_api_forecast_is_reused_next_to_an_upload(app_module, client):
+    upload_forecast(client, app_module, forecast_data('Uploaded'))
+    stored = save_api_result(forecast_data('From API'))
+
+    nearby = app_module.forecast_engine.find_nearby_result('51.5080,-0.1270', 3)
+    assert nearby['nearby']['result_id'] == stored.id
+    assert nearby['current']['condition'] == 'From API'
+    assert len(nearby['forecast_days']) == 3
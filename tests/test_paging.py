@@ -0,0 +1,79 @@
+"""
+Keyset pagination over (created_at, id), including rows that share a
+created_at, for requests and results.
+"""
+
+import pytest
+
+from models import ForecastResult, WeatherRequest, encode_cursor, transaction
+
+TIMESTAMPS = ('2026-01-01 10:00:00', '2026-01-01 09:00:00', '2026-01-02 08:00:00')
+
+
+@pytest.fixture
+def rows(db):
+    """22 requests with one result each; created_at values repeat across ids."""
+    requests = WeatherRequest.save_many([
+        WeatherRequest(query=f'Town {i}', query_type='city', range_days=3) for i in range(22)])
+    results = ForecastResult.save_many([
+        ForecastResult(request_id=r.id, location_name=r.query, forecast_data={}) for r in requests])
+    with transaction() as conn:
+        for table, objects in (('weather_request', requests), ('forecast_result', results)):
+            conn.executemany(f'UPDATE {table} SET created_at = ? WHERE id = ?',
+                             [(TIMESTAMPS[i % 3], obj.id) for i, obj in enumerate(objects)])
+    return requests, results
+
+
+def expected_order(objects):
+    created = {obj.id: TIMESTAMPS[i % 3] for i, obj in enumerate(objects)}
+    return sorted(created, key=lambda row_id: (created[row_id], row_id), reverse=True)
+
+
+def page_ids(model, limit):
+    ids, cursor, pages = [], None, 0
+    while True:
+        page, cursor = model.get_page(limit, cursor)
+        ids += [obj.id for obj in page]
+        pages += 1
+        if cursor is None:
+            return ids, pages
+
+
+@pytest.mark.parametrize('limit', [1, 4, 11, 22, 50])
+def test_pages_cover_every_row_once_in_order(rows, limit):
+    requests, results = rows
+    for model, objects in ((WeatherRequest, requests), (ForecastResult, results)):
+        ids, pages = page_ids(model, limit)
+        assert ids == expected_order(objects)
+        assert len(set(ids)) == len(objects)
+        # A full last page is followed by one empty page
+        assert pages == len(objects) // limit + 1
+
+
+def test_iter_all_matches_pages(rows):
+    requests, results = rows
+    assert [r.id for r in WeatherRequest.iter_all(batch_size=5)] == expected_order(requests)
+    assert [r.id for r in ForecastResult.iter_all(batch_size=5)] == expected_order(results)
+
+
+def test_cursor_inside_a_created_at_group(rows):
+    requests, _ = rows
+    order = expected_order(requests)
+    # Resume after the second row of the newest group: same created_at, lower id
+    after = WeatherRequest.get_page(2)[0][1]
+    assert after.id == order[1]
+    page, _ = WeatherRequest.get_page(3, encode_cursor(after.created_at, after.id))
+    assert [r.id for r in page] == order[2:5]
+
+
+@pytest.mark.parametrize('cursor', ['!!not-base64!!', 'bm90IGpzb24', 'WyJ4Il0', 'WyJ4IiwgInkiXQ', ''])
+def test_malformed_cursor_starts_from_the_first_page(rows, cursor):
+    first_page, _ = WeatherRequest.get_page(5)
+    page, _ = WeatherRequest.get_page(5, cursor)
+    assert [r.id for r in page] == [r.id for r in first_page]
+    page, _ = ForecastResult.get_page(5, cursor)
+    assert [r.id for r in page] == [r.id for r in ForecastResult.get_page(5)[0]]
+
+
+def test_history_page_with_malformed_cursor(app_module, client, rows):
+    assert client.get('/history?cursor=%%%garbage').status_code == 200
@@ -0,0 +1,63 @@
+"""
+Job progress events: shared through the database, so a stream served by one
+process follows a job run by another.
+"""
+
+import threading
+import time
+
+import pytest
+
+from jobs import ProgressBroker
+from models import ForecastProgress, WeatherRequest
+
+
+@pytest.fixture
+def request_id(db):
+    return WeatherRequest(query='London', query_type='city', range_days=3,
+                          status='processing').save().id
+
+
+def test_events_are_visible_to_other_brokers(request_id):
+    worker, reader = ProgressBroker(poll_interval=0.05), ProgressBroker(poll_interval=0.05)
+    worker.publish(request_id, 'started', {'attempt': 1})
+    worker.publish(request_id, 'current', {'location': 'London'})
+
+    assert reader.wait(request_id, timeout=0) == [
+        (1, 'started', {'attempt': 1}), (2, 'current', {'location': 'London'})]
+    assert reader.wait(request_id, after=2, timeout=0) == []
+
+
+def test_reader_wakes_on_events_from_another_process(request_id):
+    reader = ProgressBroker(poll_interval=0.05)
+    timer = threading.Timer(0.2, ForecastProgress.append, (request_id, 'done'))
+    timer.start()
+    start = time.time()
+    events = reader.wait(request_id, timeout=5)
+    timer.join()
+    assert [event for _, event, _ in events] == ['done']
+    assert time.time() - start < 1
+
+
+def test_finished_logs_are_purged_after_retention(request_id):
+    broker = ProgressBroker(retention=0)
+    broker.publish(request_id, 'started')
+    time.sleep(0.01)
+    broker.publish(request_id, 'done')
+    time.sleep(0.01)
+    other = WeatherRequest(query='Paris', query_type='city', range_days=3).save().id
+    broker.publish(other, 'done')
+    assert ForecastProgress.since(request_id) == []
+
+
+def test_stream_replays_events_published_elsewhere(app_module, client):
+    weather_request = WeatherRequest(query='London', query_type='city', range_days=3,
+                                     status='processing').save()
+    other_process = ProgressBroker()
+    other_process.publish(weather_request.id, 'started', {'attempt': 1})
+    other_process.publish(weather_request.id, 'done')
+
+    body = client.get(f'/stream/{weather_request.id}').get_data(as_text=True)
+    assert 'event: started' in body
+    assert 'event: done' in body
+    assert f'/forecast/{weather_request.id}' in body
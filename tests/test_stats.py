@@ -0,0 +1,94 @@
+"""
+Mergeable running statistics: merging consecutive chunk states must give
+the same result as one pass over the whole sequence.
+"""
+
+import math
+import random
+import statistics
+
+import pytest
+
+from stats import ReadingStats, RunningStats
+
+
+def two_pass(values):
+    """Reference statistics computed directly from the values."""
+    n = len(values)
+    mean = sum(values) / n
+    x_mean = (n - 1) / 2
+    sxx = sum((i - x_mean) ** 2 for i in range(n))
+    slope = sum((i - x_mean) * (v - mean) for i, v in enumerate(values)) / sxx if sxx else 0
+    variance = statistics.variance(values) if n > 1 else 0.0
+    return {'count': n, 'mean': mean, 'variance': variance, 'slope': slope,
+            'min': min(values), 'max': max(values)}
+
+
+def merged(values, sizes):
+    """Merge states built over consecutive chunks of the given sizes."""
+    assert sum(sizes) == len(values)
+    total, start = RunningStats(), 0
+    for size in sizes:
+        total.merge(RunningStats().update(values[start:start + size]))
+        start += size
+    return total
+
+
+def assert_matches(stats, expected):
+    assert stats.count == expected['count']
+    assert stats.min == expected['min'] and stats.max == expected['max']
+    for name in ('mean', 'variance', 'slope'):
+        assert math.isclose(getattr(stats, name), expected[name], rel_tol=1e-9, abs_tol=1e-9), name
+
+
+_rng = random.Random(7)
+VALUES = [15 + 0.05 * i + _rng.uniform(-5, 5) for i in range(200)]
+
+
+@pytest.mark.parametrize('sizes', [
+    [200],
+    [1] * 200,
+    [0, 200, 0],
+    [1, 199],
+    [199, 1],
+    [0, 1, 0, 2, 0, 3, 194],
+    [97, 0, 1, 1, 45, 56],
+    [3, 150, 1, 46],
+])
+def test_merge_of_uneven_chunks_matches_single_pass(sizes):
+    expected = two_pass(VALUES)
+    assert_matches(RunningStats().update(VALUES), expected)
+    assert_matches(merged(VALUES, sizes), expected)
+
+
+def test_merge_random_chunkings():
+    rng = random.Random(42)
+    for _ in range(50):
+        values = [rng.gauss(20, 8) for _ in range(rng.randint(2, 300))]
+        cuts = sorted(rng.randint(0, len(values)) for _ in range(rng.randint(0, 10)))
+        sizes = [b - a for a, b in zip([0] + cuts, cuts + [len(values)])]
+        assert_matches(merged(values, sizes), two_pass(values))
+
+
+def test_merge_into_and_with_empty_states():
+    single = RunningStats().update([4.0])
+    assert RunningStats().merge(RunningStats()).count == 0
+    assert RunningStats().merge(single).summary() == single.summary()
+    assert single.merge(RunningStats()).summary() == RunningStats().update([4.0]).summary()
+    assert single.variance == 0.0 and single.slope == 0
+
+
+def test_reading_stats_merge_matches_single_pass():
+    readings = [{'temperature': 10 + i % 5, 'humidity': 40 + i % 11} if i % 4 else {'temp': i / 3}
+                for i in range(120)] + ['not a reading']
+    single = ReadingStats().update(readings)
+    total = ReadingStats()
+    for start, end in ((0, 0), (0, 1), (1, 50), (50, 51), (51, 121)):
+        total.merge(ReadingStats().update(readings[start:end]))
+
+    assert total.data_points == single.data_points == 121
+    for field in ('temperature', 'humidity'):
+        a, b = getattr(total, field), getattr(single, field)
+        assert a.count == b.count
+        for name in ('mean', 'variance', 'slope'):
+            assert math.isclose(getattr(a, name), getattr(b, name), rel_tol=1e-9, abs_tol=1e-9)
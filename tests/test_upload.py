@@ -0,0 +1,44 @@
+"""
+Uploaded readings through the form: queued, saved and rendered.
+"""
+
+import io
+import json
+
+from conftest import run_queued_jobs
+from models import ForecastResult, WeatherRequest
+
+
+def upload(client, content, filename='readings.json'):
+    return client.post('/forecast', data={
+        'location': '',
+        'days': '3',
+        'json_file': (io.BytesIO(content), filename),
+    }, content_type='multipart/form-data')
+
+
+def test_single_object_upload_renders_result(app_module, client):
+    reading = {'temperature': 21.5, 'humidity': 60, 'condition': 'Sunny'}
+    response = upload(client, json.dumps(reading).encode())
+    assert response.status_code == 302
+    request_id = int(response.headers['Location'].split('/loading/')[1].split('?')[0])
+
+    run_queued_jobs(app_module)
+    assert WeatherRequest.get_by_id(request_id).status == 'completed'
+    assert ForecastResult.get_by_request_id(request_id) is not None
+
+    page = client.get(f'/forecast/{request_id}')
+    assert page.status_code == 200
+    assert b'21.5' in page.data
+    assert b'Sunny' in page.data
+
+
+def test_readings_list_upload_renders_result(app_module, client):
+    readings = [{'temperature': 10 + i, 'humidity': 50 + i} for i in range(10)]
+    response = upload(client, json.dumps(readings).encode())
+    request_id = int(response.headers['Location'].split('/loading/')[1].split('?')[0])
+
+    run_queued_jobs(app_module)
+    page = client.get(f'/forecast/{request_id}')
+    assert page.status_code == 200
+    assert b'Trend Analysis' in page.data